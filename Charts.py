@@ -1,31 +1,143 @@
+import os
+import sys
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
+# --------------------------------------------------
+# matplotlib is only imported the first time a chart
+# is drawn, so runs that never plot start faster.
+# --------------------------------------------------
+
+# Most points drawn on a trend chart (about one per
+# pixel column); longer series are downsampled
+MAX_TREND_POINTS = 1000
+
+# Dots are drawn on the line only for short series
+MARKER_MAX_POINTS = 60
+
+
+def is_headless():
+    """
+    True when there is no screen to show charts on
+    (e.g. a server or batch host).
+    """
+    if sys.platform.startswith(("win", "darwin")):
+        return False
+    return not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def get_pyplot():
+    """
+    Imports matplotlib.pyplot on first use.
+    Without a screen, the non-GUI "Agg" backend is used
+    (unless MPLBACKEND says otherwise).
+    """
+    if "matplotlib.pyplot" not in sys.modules:
+        import matplotlib
+        if is_headless() and not os.environ.get("MPLBACKEND"):
+            matplotlib.use("Agg")
+
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Picks `n_out` points (always the first and last)
+    that keep the visual shape of the line: in every
+    bucket, the point forming the biggest triangle with
+    the previous pick and the next bucket's average.
+    Returns the positions of the picked points.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bucket edges for the points between first and last
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+
+    chosen = np.empty(n_out, dtype=int)
+    chosen[0], chosen[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Average point of the next bucket (the last point for the last bucket)
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Triangle areas (x2) for every point of this bucket
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
 
-def plot_revenue_trend(rev_time, date_col, revenue_col, ax, insights=None):
+        a = start + int(np.argmax(area))
+        chosen[i + 1] = a
+
+    return chosen
+
+
+def downsample_trend(rev_time, date_col, revenue_col, max_points=MAX_TREND_POINTS):
+    """
+    Returns at most `max_points` rows of the trend table,
+    chosen so the chart looks the same (peaks and dips kept).
+    """
+    if len(rev_time) <= max_points:
+        return rev_time
+
+    dates = rev_time[date_col]
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        x = dates.to_numpy().astype("datetime64[ns]").astype("int64").astype("float64")
+    else:
+        x = np.arange(len(rev_time), dtype="float64")
+
+    # Gaps (zero revenue is stored as missing) are filled
+    # only for choosing points; the real values are drawn
+    y = pd.to_numeric(rev_time[revenue_col], errors="coerce").astype("float64")
+    y = y.interpolate(limit_direction="both").fillna(0).to_numpy()
+
+    return rev_time.iloc[lttb_indices(x, y, max_points)]
+
+
+def plot_revenue_trend(rev_time, date_col, revenue_col, ax, insights=None, max_points=MAX_TREND_POINTS,
+                       grain=None):
     """
     This function draws a simple line chart
     to show how revenue changes over time.
     The chart is drawn on a provided axis (ax)
     so it can be part of a dashboard.
+    Very long series are downsampled to `max_points`.
+    `grain` (e.g. "Monthly") is shown in the title.
     """
 
+    # Keep the chart light however long the series is
+    points = downsample_trend(rev_time, date_col, revenue_col, max_points)
+
     # -----------------------------------
     # Draw the line chart
     # X-axis = date
     # Y-axis = revenue
     # marker="o" adds small dots on points
+    # (only when there are few of them)
     # -----------------------------------
     ax.plot(
-        rev_time[date_col],
-        rev_time[revenue_col],
-        marker="o"
+        points[date_col],
+        points[revenue_col],
+        marker="o" if len(points) <= MARKER_MAX_POINTS else None
     )
 
     # -----------------------------------
     # Adding chart details so it looks nice
     # -----------------------------------
-    ax.set_title("Revenue Trend Over Time")   # chart title
+    title = "Revenue Trend Over Time"
+    if grain:
+        title += f" ({grain})"
+    ax.set_title(title)                       # chart title
     ax.set_xlabel("Date")                     # x-axis label
     ax.set_ylabel("Revenue")                  # y-axis label
 
@@ -36,18 +148,57 @@ def plot_revenue_trend(rev_time, date_col, revenue_col, ax, insights=None):
     ax.grid(True)
 
 
-def plot_pareto(table, dim_col, revenue_col, ax, top_n=5):
+def top_n_with_other(table, dim_col, revenue_col, top_n=5):
+    """
+    The `top_n` biggest members (found with a partial
+    selection, the table does not need to be sorted)
+    plus one "Other (N more)" row with everything else.
+    """
+    values = table[revenue_col].to_numpy(dtype="float64")
+    values = np.nan_to_num(values)
+
+    if len(values) <= top_n:
+        top = np.argsort(-values, kind="stable")
+    else:
+        # Only the top N are sorted, not the whole table
+        top = np.argpartition(-values, top_n - 1)[:top_n]
+        top = top[np.argsort(-values[top], kind="stable")]
+
+    data = table.iloc[top][[dim_col, revenue_col]].copy()
+    data[dim_col] = data[dim_col].astype(str)
+
+    if len(values) > top_n:
+        label = f"Other ({len(values) - top_n} more)"
+
+        # A real member may have the same name: bars with the
+        # same label would be drawn on top of each other
+        while (data[dim_col] == label).any():
+            label = f"({label})"
+
+        other = pd.DataFrame({dim_col: [label], revenue_col: [values.sum() - values[top].sum()]})
+        data = pd.concat([data, other], ignore_index=True)
+
+    return data
+
+
+def plot_pareto(table, dim_col, revenue_col, ax, top_n=5, other=False):
     """
     This function creates a Pareto chart.
     Pareto chart = bars + cumulative percentage line.
     The chart is drawn on a provided axis (ax)
     so it can be part of a dashboard.
+    With other=True the rest of the members are added
+    as one "Other (N more)" bar, and the line shows the share
+    of the full total.
     """
 
     # -----------------------------------
     # Take only top N rows (highest revenue)
     # -----------------------------------
-    data = table.head(top_n).copy()
+    if other:
+        data = top_n_with_other(table, dim_col, revenue_col, top_n)
+    else:
+        data = table.head(top_n).copy()
 
     # -----------------------------------
     # Calculate cumulative percentage
@@ -81,4 +232,5 @@ def plot_pareto(table, dim_col, revenue_col, ax, top_n=5):
     # -----------------------------------
     # Final touches
     # -----------------------------------
-    ax.set_title(f"Pareto Analysis: Top {top_n} {dim_col}")
+    title = f"Pareto Analysis: Top {top_n} {dim_col}"
+    ax.set_title(title + " + Other" if other and len(data) > top_n else title)
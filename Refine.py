@@ -1,3 +1,8 @@
+from profiling import profiled
+from sketches import distinct_ratio_below
+
+
+@profiled("refine_business_kpis")
 def refine_business_kpis(df, roles):
     """
     This function takes raw detected columns
@@ -8,6 +13,7 @@ def refine_business_kpis(df, roles):
     # This dictionary will store the final KPIs
     refined = {
         "date": None,        # main date column
+        "date_format": None, # format of the date column (if detected)
         "revenue": None,     # revenue column
         "quantity": None,    # quantity / units column
         "profit": None,      # profit column (if any)
@@ -36,6 +42,10 @@ def refine_business_kpis(df, roles):
     if not refined["date"]:
         refined["warnings"].append("No date column resolved")
 
+    # Pass on the date format col_role detected,
+    # so the growth engine doesn't have to guess it again
+    refined["date_format"] = roles.get("date_formats", {}).get(refined["date"])
+
     # --------------------------------------------------
     # 2️⃣ REVENUE SELECTION
     # --------------------------------------------------
@@ -104,17 +114,15 @@ def refine_business_kpis(df, roles):
         if "id" in col.lower() or "date" in col.lower():
             continue
 
-        # Check how many unique values exist
-        # Too many unique values = messy analysis
-        cardinality_ratio = df[col].nunique(dropna=True) / max(1, len(df))
-
         # If column name matches priority keywords → Tier-1
         if any(k in col.lower() for k in priority_keywords):
             tier1_dims.append(col)
             continue
 
         # Otherwise keep only medium-cardinality columns
-        if cardinality_ratio < 0.3:
+        # (too many unique values = messy analysis).
+        # Huge columns are estimated, not counted exactly
+        if distinct_ratio_below(df[col], 0.3):
             tier2_dims.append(col)
 
     # By default, we only use Tier-1 dimensions
@@ -1,12 +1,9 @@
+import numpy as np
 import pandas as pd
 import re
 
-import warnings
-warnings.filterwarnings(
-    "ignore",
-    message="Could not infer format",
-    category=UserWarning
-)
+from dates import sniff_date_format, parse_dates
+from profiling import profiled, step
 
 # -----------------------------------
 # Keywords to guess column meaning
@@ -33,9 +30,222 @@ def name_signal_score(col_name, signal_type):
     return 0
 
 
+# Currency symbols and thousands separators removed before parsing numbers
+currency_pattern = r"[₹,$,]"
+
+
+# -----------------------------------
+# Column profiler
+# -----------------------------------
+# Cleans and parses every column ONCE so all
+# the detection steps can share the results
+def profile_columns(sample):
+    """
+    Parses all columns of the sample in one go.
+    Returns a dictionary (one entry per column) with:
+    - "numeric": values after removing currency symbols
+    - "raw_numeric": values parsed without any cleanup
+    - "numeric_rate": share of values that are numbers
+    Dates are parsed later, only when needed, and cached
+    in the same dictionary.
+    """
+    profile = {}
+    n_rows = len(sample)
+
+    # Columns that are already stored as numbers
+    # do not need any text cleanup
+    number_cols = [
+        col for col in sample.columns
+        if pd.api.types.is_numeric_dtype(sample[col])
+        and not pd.api.types.is_bool_dtype(sample[col])
+    ]
+    text_cols = [col for col in sample.columns if col not in set(number_cols)]
+
+    if number_cols:
+        values = sample[number_cols].astype("float64").to_numpy(na_value=np.nan)
+        for i, col in enumerate(number_cols):
+            profile[col] = {"numeric": values[:, i], "raw_numeric": values[:, i]}
+
+    if text_cols:
+        # Put all text columns together as one long column
+        # and only clean/parse each distinct string once
+        text = sample[text_cols].astype(str).to_numpy().ravel(order="F")
+        codes, uniques = pd.factorize(text)
+        uniques = pd.Series(uniques, dtype=object)
+
+        cleaned_text = uniques.str.replace(currency_pattern, "", regex=True)
+        parsed = pd.to_numeric(cleaned_text, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+        # Text that needed cleanup never parses as a number on its own
+        parsed_raw = np.where(uniques.to_numpy() == cleaned_text.to_numpy(), parsed, np.nan)
+
+        cleaned = parsed[codes].reshape((n_rows, len(text_cols)), order="F")
+        raw = parsed_raw[codes].reshape((n_rows, len(text_cols)), order="F")
+
+        for i, col in enumerate(text_cols):
+            profile[col] = {"numeric": cleaned[:, i], "raw_numeric": raw[:, i]}
+
+    for col in sample.columns:
+        values = profile[col]["numeric"]
+        profile[col]["numeric_rate"] = (~np.isnan(values)).mean() if n_rows else np.nan
+
+    return profile
+
+
+def integer_ratio(values):
+    """
+    Share of (non-missing) values that are whole numbers.
+    """
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.nan
+    return (values % 1 == 0).mean()
+
+
+def parsed_dates(profile, sample, col):
+    """
+    Parses a column as dates the first time it is asked for,
+    then reuses the parsed values (and the sniffed format).
+    """
+    if "dates" not in profile[col]:
+        fmt = sniff_date_format(sample[col])
+        profile[col]["date_format"] = fmt
+        profile[col]["dates"] = parse_dates(sample[col], fmt)
+    return profile[col]["dates"]
+
+
+# -----------------------------------
+# Total = Quantity × Price detector
+# -----------------------------------
+def product_match_rates(values, triples, batch_cells=4_000_000):
+    """
+    For many (total, qty, price) column triples, returns
+    the share of rows where qty × price is within 1% of
+    the total (rows that give no answer, e.g. missing
+    values, are ignored).
+    """
+    rates = np.empty(len(triples))
+    batch = max(1, batch_cells // max(1, len(values)))
+
+    for start in range(0, len(triples), batch):
+        total, qty, price = triples[start:start + batch].T
+
+        with np.errstate(all="ignore"):
+            lhs = values[:, qty] * values[:, price]
+            rhs = values[:, total]
+            ratio = np.abs(lhs - rhs) / rhs
+
+            answered = ~np.isnan(ratio)
+            matched = (ratio < 0.01) & answered
+            rates[start:start + batch] = matched.sum(axis=0) / answered.sum(axis=0)
+
+    return rates
+
+
+def find_product_columns(sample, columns, probe_rows=64, match_threshold=0.8, seed=42):
+    """
+    Finds every (total, qty, price) combination where
+    total ≈ qty × price (within 1%) for most rows.
+
+    Checking every combination on every row is very slow,
+    so we first look at a few "probe" rows only:
+    - on each probe row, multiply every pair of columns
+    - look the product up in the sorted list of values
+      of that row (a total must sit within 1% of it)
+    - keep combinations that match on at least half
+      of the probe rows
+    A combination that really matches on 80% of rows
+    almost surely passes this filter. Only the few
+    survivors are then checked on all rows.
+    """
+
+    # Only columns stored as numbers can be multiplied
+    columns = [
+        col for col in columns
+        if pd.api.types.is_numeric_dtype(sample[col])
+        and not pd.api.types.is_bool_dtype(sample[col])
+    ]
+    n_cols = len(columns)
+
+    if n_cols < 3 or len(sample) == 0:
+        return []
+
+    values = sample[columns].astype("float64").to_numpy(na_value=np.nan)
+
+    # Pick probe rows: the most complete rows first (random among equals)
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(values))
+    completeness = np.isfinite(values[order]).sum(axis=1)
+    probes = values[order[np.argsort(-completeness, kind="stable")[:probe_rows]]]
+
+    # All unordered pairs of different columns (qty × price = price × qty)
+    left, right = np.triu_indices(n_cols, k=1)
+    n_pairs = len(left)
+
+    # Candidates are stored as one number: total * n_pairs + pair
+    found = []
+    every_pair_totals = np.zeros(n_cols, dtype=bool)
+
+    for row in probes:
+        finite = np.isfinite(row)
+
+        # Products of every pair on this row
+        pair_idx = np.flatnonzero(finite[left] & finite[right])
+        products = row[left[pair_idx]] * row[right[pair_idx]]
+
+        # A negative total always counts as a match,
+        # so it is a candidate for every pair
+        every_pair_totals |= finite & (row < 0)
+
+        # Positive totals must be within 1% of the product:
+        # 0.99 × total < product < 1.01 × total
+        positive = np.flatnonzero(finite & (row > 0))
+        positive = positive[np.argsort(row[positive])]
+        sorted_totals = row[positive]
+
+        lo = np.searchsorted(sorted_totals, products / 1.01, side="right")
+        hi = np.searchsorted(sorted_totals, products / 0.99, side="left")
+        hi = np.where(products > 0, hi, lo)
+
+        # Expand every [lo, hi) range into (total, pair) entries
+        counts = np.maximum(hi - lo, 0)
+        owner = np.repeat(np.arange(len(counts)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        totals = positive[lo[owner] + offset]
+        found.append(totals * n_pairs + pair_idx[owner])
+
+    for t in np.flatnonzero(every_pair_totals):
+        found.append(t * n_pairs + np.arange(n_pairs))
+
+    keys = np.unique(np.concatenate(found)) if found else np.array([], dtype=int)
+    totals, pairs = np.divmod(keys, n_pairs)
+    triples = np.column_stack([totals, left[pairs], right[pairs]])
+
+    # A column can't be the total and a factor at the same time
+    triples = triples[(triples[:, 0] != triples[:, 1]) & (triples[:, 0] != triples[:, 2])]
+
+    # -----------------------------------
+    # Filter on the probe rows, then check on all rows
+    # -----------------------------------
+    probe_rates = product_match_rates(probes, triples)
+    triples = triples[~(probe_rates < 0.5)]
+
+    rates = product_match_rates(values, triples)
+    triples = triples[rates >= match_threshold]
+
+    # Both orders: qty × price and price × qty
+    matches = [(t, q, p) for t, q, p in triples.tolist()]
+    matches += [(t, p, q) for t, q, p in triples.tolist()]
+
+    # Same order as looping total → qty → price over the columns
+    matches.sort()
+    return [(columns[t], columns[q], columns[p]) for t, q, p in matches]
+
+
 # -----------------------------------
 # Main function to identify column roles
 # -----------------------------------
+@profiled("col_role")
 def col_role(df, sample_limit=5000):
 
     # This dictionary will store all detected roles
@@ -49,29 +259,32 @@ def col_role(df, sample_limit=5000):
             "quantity": [],
             "cost": []
         },
+        "date_formats": {},
         "warnings": []
     }
 
+    step("Sample and parse columns")
+
     # To keep things fast, we work on a sample if data is very large
-    sample = df.sample(sample_limit, random_state=42) if len(df) > sample_limit else df.copy()
+    # (small frames are used as they are: nothing below modifies them)
+    sample = df.sample(sample_limit, random_state=42) if len(df) > sample_limit else df
+
+    # Clean and parse every column once
+    profile = profile_columns(sample)
 
     # -----------------------------------
     # Step 1: Separate numeric and categorical columns
     # -----------------------------------
+    step("Step 1: Separate numeric and categorical columns")
     numeric_col = []
     categorical_col = []
 
     for col in sample.columns:
 
-        # Try converting column values to numbers
-        # Remove currency symbols if present
-        numeric_try = pd.to_numeric(
-            sample[col].astype(str).str.replace(r"[₹,$,]", "", regex=True),
-            errors="coerce"
-        )
-
+        # The profiler already tried converting values to numbers
+        # (with currency symbols removed)
         # If most values are numbers, treat column as numeric
-        if numeric_try.notna().mean() >= 0.6:
+        if profile[col]["numeric_rate"] >= 0.6:
             numeric_col.append(col)
         else:
             categorical_col.append(col)
@@ -82,23 +295,24 @@ def col_role(df, sample_limit=5000):
     # -----------------------------------
     # Step 2: Detect ID columns (based on values)
     # -----------------------------------
+    step("Step 2: Detect ID columns (based on values)")
     id_cols = []
 
     for col in roles["numeric"]:
-        clean_col = pd.to_numeric(sample[col], errors="coerce")
+        clean_col = profile[col]["raw_numeric"]
 
         # ID columns usually have:
         # - mostly unique values
         # - mostly integers
-        unique_ratio = clean_col.nunique(dropna=True) / len(clean_col)
-        integer_ratio = (clean_col.dropna() % 1 == 0).mean()
+        unique_ratio = len(pd.unique(clean_col[~np.isnan(clean_col)])) / len(clean_col)
 
-        if unique_ratio >= 0.9 and integer_ratio >= 0.9:
+        if unique_ratio >= 0.9 and integer_ratio(clean_col) >= 0.9:
             id_cols.append(col)
 
     # -----------------------------------
     # Step 3: Detect ID columns (based on name)
     # -----------------------------------
+    step("Step 3: Detect ID columns (based on name)")
     # If column name contains "id", it is probably an identifier
     for col in roles["numeric"]:
         if "id" in col.lower():
@@ -112,6 +326,7 @@ def col_role(df, sample_limit=5000):
     # -----------------------------------
     # Step 4: Detect date column
     # -----------------------------------
+    step("Step 4: Detect date column")
     date_score = []
 
     for col in sample.columns:
@@ -121,7 +336,7 @@ def col_role(df, sample_limit=5000):
             continue
 
         try:
-            parsed = pd.to_datetime(sample[col], errors="coerce")
+            parsed = parsed_dates(profile, sample, col)
             parse_rate = parsed.notna().mean()
 
             # Column is considered date if most values parse correctly
@@ -134,6 +349,9 @@ def col_role(df, sample_limit=5000):
                     score += 0.2
 
                 date_score.append((col, score))
+
+                # Remember the format so later steps don't guess again
+                roles["date_formats"][col] = profile[col]["date_format"]
         except:
             continue
 
@@ -141,7 +359,8 @@ def col_role(df, sample_limit=5000):
         date_score.sort(key=lambda x: x[1], reverse=True)
         roles["date"] = {
             "column": date_score[0][0],
-            "confidence": round(date_score[0][1], 2)
+            "confidence": round(date_score[0][1], 2),
+            "format": roles["date_formats"][date_score[0][0]]
         }
     else:
         roles["warnings"].append("No date column confidently detected")
@@ -149,17 +368,16 @@ def col_role(df, sample_limit=5000):
     # -----------------------------------
     # Step 5: Basic stats for numeric columns
     # -----------------------------------
+    step("Step 5: Basic stats for numeric columns")
     numeric_stat = {}
 
     for col in roles["numeric"]:
-        clean_col = pd.to_numeric(
-            sample[col].astype(str).str.replace(r"[₹,$,]", "", regex=True),
-            errors="coerce"
-        )
+        clean_col = profile[col]["numeric"]
+        present = clean_col[~np.isnan(clean_col)]
 
         numeric_stat[col] = {
-            "mean": clean_col.mean(),
-            "integer_ratio": (clean_col.dropna() % 1 == 0).mean(),
+            "mean": present.mean() if len(present) else np.nan,
+            "integer_ratio": integer_ratio(clean_col),
             "neg_ratio": (clean_col < 0).mean()
         }
 
@@ -173,6 +391,7 @@ def col_role(df, sample_limit=5000):
     # -----------------------------------
     # Step 6: Score KPI candidates
     # -----------------------------------
+    step("Step 6: Score KPI candidates")
     for col, stats in numeric_stat.items():
 
         monetary_score = 0
@@ -215,34 +434,21 @@ def col_role(df, sample_limit=5000):
     # -----------------------------------
     # Step 7: Detect Total = Quantity × Price
     # -----------------------------------
-    for total_col in roles["numeric"]:
-        for qty_col in roles["numeric"]:
-            for price_col in roles["numeric"]:
-
-                # All three columns must be different
-                if len({total_col, qty_col, price_col}) < 3:
-                    continue
-
-                try:
-                    lhs = sample[qty_col] * sample[price_col]
-                    rhs = sample[total_col]
-
-                    # Check if calculation matches for most rows
-                    match_rate = (abs(lhs - rhs) / rhs).dropna().lt(0.01).mean()
-
-                    if match_rate >= 0.8:
-                        roles["kpi_candidates"]["monetary"].append(
-                            {"column": total_col, "score": 1.0}
-                        )
-                        roles["kpi_candidates"]["quantity"].append(
-                            {"column": qty_col, "score": 1.0}
-                        )
-                except:
-                    continue
+    step("Step 7: Detect Total = Quantity × Price")
+    # Only a few likely combinations are checked on all rows
+    # (see find_product_columns)
+    for total_col, qty_col, price_col in find_product_columns(sample, roles["numeric"]):
+        roles["kpi_candidates"]["monetary"].append(
+            {"column": total_col, "score": 1.0}
+        )
+        roles["kpi_candidates"]["quantity"].append(
+            {"column": qty_col, "score": 1.0}
+        )
 
     # -----------------------------------
     # Step 8: Remove duplicate KPI entries
     # -----------------------------------
+    step("Step 8: Remove duplicate KPI entries")
     def dedupe_kpis(kpi_list):
         best = {}
         for item in kpi_list:
@@ -257,6 +463,7 @@ def col_role(df, sample_limit=5000):
     # -----------------------------------
     # Step 9: Final cleanup
     # -----------------------------------
+    step("Step 9: Final cleanup")
     # ID columns should never be KPIs
     for k in roles["kpi_candidates"]:
         roles["kpi_candidates"][k] = [
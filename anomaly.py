@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from profiling import profiled
+
+# --------------------------------------------------
+# ANOMALY DETECTION
+# Every revenue series (the total, every member of every
+# dimension and, with pairs, every combination such as
+# store × category) is compared with its own recent past:
+#   gap    = actual − median of the last `window` periods
+#   spread = 1.4826 × median absolute deviation (MAD)
+#            of all the gaps of that series, but never
+#            less than the sampling noise of a series of
+#            that size (see below)
+#   score  = (gap − typical gap) / spread
+# A score beyond ±3.5 is an anomaly (robust z-score:
+# one huge month does not hide the next one, as it
+# would with a mean / standard deviation).
+# A series only has a couple of dozen gaps, so its own
+# MAD is often too small by chance (about 1 clean series
+# in 10 then gets a point past 3.5). Sums of many orders
+# are noisy in proportion to √(size), so the noise of
+# every series is also estimated from all series together:
+#   floor = c × √(median of the series), c = median over
+#   all series of (own spread / √median)
+# Revenue is compared per day, so a short month is not
+# an anomaly. All series are scored together as one 2-D
+# array (series × periods), not one loop per series.
+# --------------------------------------------------
+
+# Periods of history each point is compared with
+ANOMALY_WINDOW = 6
+
+# Robust z-score from which a point is an anomaly
+ANOMALY_THRESHOLD = 3.5
+
+# Score from which an anomaly is worth an insight. Many
+# series are checked at once (every member, every pair),
+# so a few points beyond 3.5 are expected by chance alone
+ANOMALY_ALERT_SCORE = 5.0
+
+# Anomalies smaller than this % of the period's total
+# revenue are not worth reporting
+ANOMALY_MIN_SHARE = 1.0
+
+# Series scored at a time (bounds the memory of the windows)
+BLOCK_ROWS = 20_000
+
+
+def robust_scores(values, window=ANOMALY_WINDOW):
+    """
+    values: 2-D array, one row per series, one column per period.
+    Returns (scores, expected), same shape. NaN where there is
+    not enough history yet, or the series is flat (spread 0).
+    Series shorter than 2 × window are not scored at all
+    (too few gaps to know what is usual).
+    """
+    values = np.asarray(values, dtype="float64")
+    scores = np.full(values.shape, np.nan)
+    expected = np.full(values.shape, np.nan)
+
+    if values.ndim != 2 or values.shape[1] < 2 * window:
+        return scores, expected
+
+    spread = np.empty((len(values), 1))
+
+    for start in range(0, len(values), BLOCK_ROWS):
+        block = values[start:start + BLOCK_ROWS]
+
+        # history[:, i] = the `window` periods just before period i + window
+        history = sliding_window_view(block, window, axis=1)[:, :-1]
+        gap = block[:, window:] - np.median(history, axis=2)
+
+        # What a gap usually looks like for this series
+        typical = np.median(gap, axis=1, keepdims=True)
+        spread[start:start + BLOCK_ROWS] = 1.4826 * np.median(np.abs(gap - typical), axis=1, keepdims=True)
+
+        # Unscaled for now: the spread floor needs every series
+        scores[start:start + BLOCK_ROWS, window:] = gap - typical
+        expected[start:start + BLOCK_ROWS, window:] = block[:, window:] - gap + typical
+
+    # Sampling noise floor, pooled over every series
+    size = np.sqrt(np.abs(np.median(values, axis=1, keepdims=True)))
+    sized = size[:, 0] > 0
+    if sized.any():
+        noise = np.median(spread[sized, 0] / size[sized, 0])
+        spread = np.maximum(spread, noise * size)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores[:, window:] /= spread
+    scores[:, window:][np.broadcast_to(spread == 0, scores[:, window:].shape)] = np.nan
+
+    return scores, expected
+
+
+def complete_periods(periods, freq, date_min, date_max):
+    """
+    True for every period fully covered by the data
+    (a half-finished last month would look like a crash).
+    """
+    periods = pd.DatetimeIndex(periods)
+    complete = np.ones(len(periods), dtype=bool)
+
+    if len(periods) and pd.notna(date_min):
+        # The first period starts the day after the period before it ends
+        first_start = periods[0] - pd.tseries.frequencies.to_offset(freq) + pd.Timedelta(days=1)
+        complete[0] = pd.Timestamp(date_min).normalize() <= first_start
+        complete[-1] &= pd.Timestamp(date_max).normalize() >= periods[-1]
+
+    return complete
+
+
+def period_days(periods, freq):
+    """
+    Number of days in every period (period end dates).
+    """
+    periods = pd.DatetimeIndex(periods)
+    starts = periods - pd.tseries.frequencies.to_offset(freq)
+    return np.asarray((periods - starts).days, dtype="float64")
+
+
+@profiled("detect_anomalies")
+def detect_anomalies(total, cubes, freq, complete=None, window=ANOMALY_WINDOW, threshold=ANOMALY_THRESHOLD,
+                     min_share=ANOMALY_MIN_SHARE):
+    """
+    Finds anomalies in the total revenue series (a Series
+    indexed by period) and in every member of every
+    cube ({dimension or pair name: members × periods table}).
+    `freq` is the grain of the periods and `complete`
+    marks the periods that can be judged.
+    Returns one row per anomaly, the biggest (in money) first:
+    dimension, member, period, revenue, expected, score, direction.
+    """
+    columns = ["dimension", "member", "period", "revenue", "expected", "score", "direction"]
+    periods = pd.DatetimeIndex(total.index)
+
+    # One row per series, all dimensions stacked (same periods)
+    names = [(None, "Total revenue")]
+    rows = [total.to_numpy(dtype="float64", na_value=0.0)[None, :]]
+    for dim, cube in cubes.items():
+        names.extend((dim, member) for member in cube.index)
+        rows.append(cube.reindex(columns=periods, fill_value=0).to_numpy(dtype="float64"))
+
+    values = np.concatenate(rows) if len(periods) else np.zeros((len(names), 0))
+    if complete is not None:
+        values = values[:, complete]
+        periods = periods[complete]
+
+    # Compared per day, then back to revenue per period
+    days = period_days(periods, freq)
+    scores, expected = robust_scores(values / days, window)
+    expected = expected * days
+
+    # Material anomalies only: big score and big enough in money
+    period_total = values[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.abs(values - expected) / period_total * 100
+        found = (np.abs(scores) >= threshold) & (share >= min_share)
+
+    series, position = np.nonzero(found)
+    if not len(series):
+        return pd.DataFrame(columns=columns)
+
+    table = pd.DataFrame({
+        "dimension": [names[i][0] for i in series],
+        "member": [names[i][1] for i in series],
+        "period": periods[position],
+        "revenue": values[series, position].round(2),
+        "expected": expected[series, position].round(2),
+        "score": scores[series, position].round(2),
+        "direction": np.where(scores[series, position] > 0, "spike", "drop")
+    })
+
+    gap = np.abs(table["revenue"] - table["expected"]).to_numpy()
+    return table.iloc[np.argsort(-gap, kind="stable")].reset_index(drop=True)
@@ -0,0 +1,293 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from Sort import col_role
+from Refine import refine_business_kpis
+from category import revenue_growth_engine
+from cache import load_cached_frame, save_cached_frame, load_cached_inference, save_cached_inference
+from stream import should_stream, infer_roles_from_file, streaming_growth_engine, DEFAULT_CHUNKSIZE
+from insight import generate_insights, generate_executive_summary, generate_next_steps
+
+# --------------------------------------------------
+# BATCH MODE
+# Runs the full pipeline on many files without any
+# questions asked:
+#   col_role → refine_business_kpis
+#   → revenue_growth_engine → generate_insights
+# Files are spread over a pool of worker processes.
+# Every file gets its own JSON result, and one file
+# failing never stops the others.
+#
+#   python batch.py exports/ --out results --workers 8
+#   python batch.py "exports/**/*.csv" --out results
+# --------------------------------------------------
+
+SUPPORTED = (".csv", ".xlsx", ".xls")
+
+# A worker process is replaced after this many files,
+# so memory left behind by big files is given back
+TASKS_PER_WORKER = 20
+
+
+def find_files(target):
+    """
+    A directory (all CSV / Excel files in it)
+    or a glob pattern → sorted list of files.
+    """
+    if os.path.isdir(target):
+        paths = [os.path.join(target, name) for name in os.listdir(target)]
+    else:
+        paths = glob.glob(target, recursive=True)
+
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(SUPPORTED))
+
+
+def to_jsonable(obj):
+    """
+    Converts pipeline output (DataFrames, numpy numbers,
+    timestamps, ...) into plain JSON-friendly values.
+    """
+    if isinstance(obj, pd.DataFrame):
+        # A named index (e.g. the members of a cube) is kept as a column
+        if obj.index.name is not None:
+            obj = obj.reset_index()
+        return [to_jsonable(row) for row in obj.to_dict(orient="records")]
+    if isinstance(obj, pd.Series):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, dict):
+        return {
+            (" × ".join(map(str, k)) if isinstance(k, tuple) else str(k)): to_jsonable(v)
+            for k, v in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(obj) else pd.Timestamp(obj).isoformat()
+    if isinstance(obj, np.ndarray):
+        return to_jsonable(obj.tolist())
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not np.isfinite(obj):
+        return None
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    return obj
+
+
+def read_frame(path):
+    """
+    Loads a file (through the dataset cache).
+    """
+    df = load_cached_frame(path)
+    if df is None:
+        df = pd.read_csv(path) if path.lower().endswith(".csv") else pd.read_excel(path)
+        save_cached_frame(path, df)
+    return df
+
+
+def analyze_file(path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Runs the whole pipeline on one file and
+    returns everything as one dictionary.
+    """
+
+    # Huge CSV files and big workbooks are streamed, everything else is loaded
+    if should_stream(path):
+        roles, business_kpis, _ = infer_roles_from_file(path, chunksize=chunksize)
+        results = streaming_growth_engine(path, business_kpis, chunksize=chunksize)
+    else:
+        df = read_frame(path)
+
+        cached = load_cached_inference(df)
+        if cached:
+            roles, business_kpis = cached
+        else:
+            roles = col_role(df)
+            business_kpis = refine_business_kpis(df, roles)
+            save_cached_inference(df, roles, business_kpis)
+
+        results = revenue_growth_engine(df, business_kpis)
+        del df
+
+    insights = generate_insights(results, business_kpis)
+
+    return {
+        "file": os.path.abspath(path),
+        "roles": roles,
+        "business_kpis": business_kpis,
+        "results": results,
+        "insights": insights,
+        "executive_summary": generate_executive_summary(insights),
+        "next_steps": generate_next_steps(insights)
+    }
+
+
+def output_name(path):
+    """
+    Result file name: file name + short hash of the full
+    path (two exports with the same name don't collide).
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=4).hexdigest()
+    return f"{stem}-{digest}.json"
+
+
+def run_one(path, out_dir, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Worker task: analyse one file and write its JSON.
+    Never raises: errors are written as the result.
+    """
+    start = time.perf_counter()
+    out_path = os.path.join(out_dir, output_name(path))
+
+    try:
+        report = analyze_file(path, chunksize=chunksize)
+        entry = {
+            "file": os.path.abspath(path),
+            "status": "ok",
+            "output": out_path,
+            "total_revenue": report["results"]["total_revenue"],
+            "time_grain": report["results"]["time_grain"],
+            "insights": len(report["insights"])
+        }
+    except Exception as e:   # MemoryError included: only this file fails
+        report = {
+            "file": os.path.abspath(path),
+            "error": f"{type(e).__name__}: {e}",
+            "traceback": traceback.format_exc()
+        }
+        entry = {
+            "file": os.path.abspath(path),
+            "status": "error",
+            "output": out_path,
+            "error": report["error"]
+        }
+
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+
+    with open(out_path + ".tmp", "w") as f:
+        json.dump(to_jsonable(report), f, indent=2)
+    os.replace(out_path + ".tmp", out_path)
+
+    return to_jsonable(entry)
+
+
+def _limit_memory(memory_limit_mb):
+    """
+    Worker start-up: cap the address space of the process
+    (Unix only) so one huge file raises MemoryError
+    instead of taking the whole machine down.
+    """
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 ** 2
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _make_pool(workers, memory_limit_mb):
+    try:
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_limit_memory,
+            initargs=(memory_limit_mb,),
+            max_tasks_per_child=TASKS_PER_WORKER
+        )
+    except TypeError:
+        # Python < 3.11 has no max_tasks_per_child
+        return ProcessPoolExecutor(max_workers=workers, initializer=_limit_memory, initargs=(memory_limit_mb,))
+
+
+def run_batch(files, out_dir, workers=None, chunksize=DEFAULT_CHUNKSIZE, memory_limit_mb=None, retries=1):
+    """
+    Analyses every file across a process pool and writes
+    one JSON per file plus index.json listing them all.
+    If a worker dies (e.g. killed for memory), the whole
+    pool breaks and every file still in it fails. Those
+    files are run again one at a time, each in a fresh
+    single-worker pool: only a file that kills its worker
+    on its own is retried (`retries` times), then marked
+    failed. The other files just succeed.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    entries = {}
+    broken = []
+
+    pool = _make_pool(workers, memory_limit_mb)
+    futures = {pool.submit(run_one, path, out_dir, chunksize): path for path in files}
+
+    for future in as_completed(futures):
+        path = futures[future]
+        try:
+            entries[path] = future.result()
+            print(f"{entries[path]['status']:>5}  {path}")
+        except BrokenProcessPool:
+            # This file may have killed the worker, or was only in the same pool
+            broken.append(path)
+
+    pool.shutdown(cancel_futures=True)
+
+    for path in broken:
+        for _ in range(retries + 1):
+            pool = _make_pool(1, memory_limit_mb)
+            try:
+                entries[path] = pool.submit(run_one, path, out_dir, chunksize).result()
+                break
+            except BrokenProcessPool as e:
+                entries[path] = {
+                    "file": os.path.abspath(path),
+                    "status": "error",
+                    "error": f"worker process died: {e}"
+                }
+            finally:
+                pool.shutdown(cancel_futures=True)
+
+        print(f"{entries[path]['status']:>5}  {path}")
+
+    index = [entries[path] for path in files]
+
+    with open(os.path.join(out_dir, "index.json"), "w") as f:
+        json.dump({
+            "files": len(index),
+            "ok": sum(e["status"] == "ok" for e in index),
+            "failed": sum(e["status"] != "ok" for e in index),
+            "results": index
+        }, f, indent=2)
+
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the analytics pipeline on many files.")
+    parser.add_argument("target", help="directory or glob pattern of CSV / Excel files")
+    parser.add_argument("--out", default="batch_results", help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk for streamed files")
+    parser.add_argument("--memory-limit-mb", type=int, default=None, help="address-space cap per worker (Unix)")
+    args = parser.parse_args()
+
+    files = find_files(args.target)
+    if not files:
+        print("❌ No CSV or Excel files found")
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    index = run_batch(files, args.out, args.workers, args.chunksize, args.memory_limit_mb)
+    failed = sum(e["status"] != "ok" for e in index)
+
+    print(f"\n✅ {len(index) - failed} / {len(index)} files analysed in {time.perf_counter() - start:.1f}s")
+    print(f"📁 Results: {os.path.join(args.out, 'index.json')}")
@@ -0,0 +1,137 @@
+"""
+Benchmark: column type inference in Sort.col_role.
+
+Compares the old column-by-column parsing (Steps 1, 2, 4 and 5
+each cleaning and parsing the sample again) with the shared
+column profiler, on a wide synthetic extract.
+
+Run:  python benchmarks/bench_col_role.py --cols 400 --rows 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Sort import profile_columns, parsed_dates, integer_ratio  # noqa: E402
+
+
+def make_wide_frame(n_rows, n_cols, seed=42):
+    """
+    Builds a wide frame mixing plain numbers, currency
+    strings, dates, categories and free text.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+
+    for i in range(n_cols):
+        kind = i % 5
+        if kind == 0:
+            data[f"amount_{i}"] = rng.uniform(0, 1000, n_rows).round(2)
+        elif kind == 1:
+            data[f"price_{i}"] = [f"${v:,.2f}" for v in rng.uniform(0, 5000, n_rows)]
+        elif kind == 2:
+            days = rng.integers(0, 1000, n_rows)
+            data[f"date_{i}"] = (pd.Timestamp("2020-01-01") + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d")
+        elif kind == 3:
+            data[f"segment_{i}"] = rng.choice(["North", "South", "East", "West"], n_rows)
+        else:
+            data[f"units_{i}"] = rng.integers(1, 50, n_rows)
+
+    return pd.DataFrame(data)
+
+
+def legacy_type_inference(sample):
+    """
+    The previous implementation: every step cleans
+    and parses the columns it needs on its own.
+    """
+    numeric, categorical = [], []
+
+    # Step 1
+    for col in sample.columns:
+        numeric_try = pd.to_numeric(
+            sample[col].astype(str).str.replace(r"[₹,$,]", "", regex=True),
+            errors="coerce"
+        )
+        if numeric_try.notna().mean() >= 0.6:
+            numeric.append(col)
+        else:
+            categorical.append(col)
+
+    # Step 2
+    for col in numeric:
+        clean_col = pd.to_numeric(sample[col], errors="coerce")
+        clean_col.nunique(dropna=True) / len(clean_col)
+        (clean_col.dropna() % 1 == 0).mean()
+
+    # Step 4
+    for col in categorical:
+        pd.to_datetime(sample[col], errors="coerce")
+
+    # Step 5
+    for col in numeric:
+        clean_col = pd.to_numeric(
+            sample[col].astype(str).str.replace(r"[₹,$,]", "", regex=True),
+            errors="coerce"
+        )
+        clean_col.mean(), (clean_col.dropna() % 1 == 0).mean(), (clean_col < 0).mean()
+
+    return numeric, categorical
+
+
+def profiled_type_inference(sample):
+    """
+    The same work done through the shared column profiler.
+    """
+    profile = profile_columns(sample)
+    numeric = [c for c in sample.columns if profile[c]["numeric_rate"] >= 0.6]
+    categorical = [c for c in sample.columns if c not in numeric]
+
+    for col in numeric:
+        raw = profile[col]["raw_numeric"]
+        len(pd.unique(raw[~np.isnan(raw)])) / len(raw)
+        integer_ratio(raw)
+
+    for col in categorical:
+        parsed_dates(profile, sample, col)
+
+    for col in numeric:
+        clean_col = profile[col]["numeric"]
+        np.nanmean(clean_col), integer_ratio(clean_col), (clean_col < 0).mean()
+
+    return numeric, categorical
+
+
+def best_of(fn, sample, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(sample)
+        timings.append(time.perf_counter() - start)
+    return min(timings), out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--cols", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sample = make_wide_frame(args.rows, args.cols)
+
+    legacy_time, legacy_out = best_of(legacy_type_inference, sample, args.repeat)
+    profiled_time, profiled_out = best_of(profiled_type_inference, sample, args.repeat)
+
+    assert legacy_out == profiled_out, "profiler changed the numeric/categorical split"
+
+    print(f"rows={args.rows} cols={args.cols}")
+    print(f"legacy per-step parsing : {legacy_time:8.3f} s")
+    print(f"shared column profiler  : {profiled_time:8.3f} s")
+    print(f"speed-up                : {legacy_time / profiled_time:8.1f}x")
@@ -0,0 +1,177 @@
+"""
+Benchmark: the whole pipeline, phase by phase, on synthetic data.
+
+For every dataset size a CSV is generated (benchmarks/datagen.py),
+then each phase is timed on its own:
+  load → col_role → refine_business_kpis → revenue_growth_engine
+  → generate_insights → render (PDF dashboard)
+Files big enough to be streamed are measured on the streaming path
+(infer_roles_from_file → incremental_growth_engine) instead.
+
+Per phase: wall time, CPU time and peak Python memory (tracemalloc).
+tracemalloc slows Python down a lot, so times come from a first
+run without it and memory from a second run with it.
+Results are saved as JSON (with the git commit), so runs on
+different commits can be compared.
+
+Run:  python benchmarks/bench_pipeline.py --rows 10000,100000,1000000 --json bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# The caches would hide the real cost of every phase
+os.environ["AUTOINSIGHT_CACHE"] = "0"
+
+from datagen import write_sales_csv, parse_dims  # noqa: E402
+from Sort import col_role  # noqa: E402
+from Refine import refine_business_kpis  # noqa: E402
+from category import revenue_growth_engine  # noqa: E402
+from insight import generate_insights  # noqa: E402
+from stream import should_stream, infer_roles_from_file, incremental_growth_engine  # noqa: E402
+from report import dashboard_pages, export_dashboard  # noqa: E402
+
+
+@contextmanager
+def measure(phases, name, memory=True):
+    """
+    Records wall time, CPU time and peak traced memory
+    of the code inside the `with` block under `name`.
+    """
+    if memory:
+        tracemalloc.reset_peak()
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    yield
+
+    phases[name] = {
+        "seconds": round(time.perf_counter() - wall, 4),
+        "cpu_seconds": round(time.process_time() - cpu, 4)
+    }
+    if memory:
+        phases[name]["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+
+
+def run_pipeline(path, memory=True, render=True):
+    """
+    Runs every phase on one file. Returns {phase: numbers}.
+    """
+    phases = {}
+
+    if should_stream(path):
+        state = os.path.join(tempfile.mkdtemp(), "state.pkl")
+
+        with measure(phases, "infer_roles_from_file", memory):
+            roles, business_kpis, _ = infer_roles_from_file(path)
+        with measure(phases, "incremental_growth_engine", memory):
+            results = incremental_growth_engine(path, business_kpis, state_path=state)
+    else:
+        with measure(phases, "load", memory):
+            df = pd.read_csv(path)
+        with measure(phases, "col_role", memory):
+            roles = col_role(df)
+        with measure(phases, "refine_business_kpis", memory):
+            business_kpis = refine_business_kpis(df, roles)
+        with measure(phases, "revenue_growth_engine", memory):
+            results = revenue_growth_engine(df, business_kpis)
+        del df
+
+    with measure(phases, "generate_insights", memory):
+        insights = generate_insights(results, business_kpis)
+
+    if render:
+        out = os.path.join(tempfile.mkdtemp(), "dashboard.pdf")
+        with measure(phases, "render", memory):
+            export_dashboard(dashboard_pages(results, business_kpis, insights), out)
+
+    return phases
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,100000", help="comma-separated dataset sizes")
+    parser.add_argument("--dims", default="", help='dimension cardinalities, e.g. "Region=50,Store=2000"')
+    parser.add_argument("--extra-cols", type=int, default=0)
+    parser.add_argument("--currency", action="store_true", help='Sales as "$1,234.50" strings')
+    parser.add_argument("--date-format", default="%m/%d/%Y")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc (memory) run")
+    parser.add_argument("--no-render", action="store_true", help="skip the PDF rendering phase")
+    parser.add_argument("--data-dir", default=None, help="keep generated files here (default: temp dir)")
+    parser.add_argument("--json", default=None, help="save the results to this file")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp()
+    os.makedirs(data_dir, exist_ok=True)
+    options = {
+        "cardinality": parse_dims(args.dims),
+        "extra_cols": args.extra_cols,
+        "currency": args.currency,
+        "date_format": args.date_format
+    }
+
+    runs = []
+    for n_rows in [int(n) for n in args.rows.split(",")]:
+        name = f"sales-{n_rows}-{args.seed}{'-cur' if args.currency else ''}-x{args.extra_cols}.csv"
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            write_sales_csv(path, n_rows, seed=args.seed, **options)
+
+        phases = run_pipeline(path, memory=False, render=not args.no_render)
+
+        # Second run only for memory: tracemalloc distorts the times
+        if not args.no_memory:
+            tracemalloc.start()
+            traced = run_pipeline(path, memory=True, render=not args.no_render)
+            tracemalloc.stop()
+            for phase, numbers in traced.items():
+                phases[phase]["peak_mb"] = numbers["peak_mb"]
+
+        runs.append({
+            "rows": n_rows,
+            "file_mb": round(os.path.getsize(path) / 1024 ** 2, 1),
+            "phases": phases
+        })
+
+        print(f"\nrows={n_rows:,}")
+        for phase, numbers in phases.items():
+            peak = f"{numbers['peak_mb']:9.1f} MB" if "peak_mb" in numbers else ""
+            print(f"  {phase:<26} {numbers['seconds']:9.3f} s  cpu {numbers['cpu_seconds']:9.3f} s {peak}")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "config": {**vars(args), "cardinality": options["cardinality"]},
+        "runs": runs
+    }
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📁 Results saved to {args.json}")
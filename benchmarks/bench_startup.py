@@ -0,0 +1,89 @@
+"""
+Benchmark: start-up time of the engine modules.
+
+Measures, in fresh Python processes:
+- how long `import <module>` takes (median of N runs)
+- whether matplotlib got imported along the way
+- the slowest imports reported by `python -X importtime`
+
+Run:  python benchmarks/bench_startup.py --runs 10 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["brain", "batch", "service", "Charts"]
+
+
+def time_import(module, runs):
+    """
+    Median wall time of a fresh interpreter importing `module`
+    (minus the time of a bare interpreter start).
+    """
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        return time.perf_counter() - start
+
+    bare = statistics.median(run("pass") for _ in range(runs))
+    full = statistics.median(run(f"import {module}") for _ in range(runs))
+    return full - bare
+
+
+def loads_matplotlib(module):
+    code = f"import sys, {module}; print('matplotlib' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return out.stdout.strip() == "True"
+
+
+def slowest_imports(module, top=10):
+    """
+    Top imports by cumulative time (microseconds) from -X importtime.
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, check=True, capture_output=True, text=True
+    )
+
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self [us] | cumulative | module"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", default=None, help="also save the results to this file")
+    args = parser.parse_args()
+
+    report = {}
+    for module in MODULES:
+        seconds = time_import(module, args.runs)
+        report[module] = {
+            "import_seconds": round(seconds, 4),
+            "loads_matplotlib": loads_matplotlib(module),
+            "slowest_imports_us": slowest_imports(module)
+        }
+        print(f"{module:<8} import {seconds * 1000:8.1f} ms   matplotlib loaded: {report[module]['loads_matplotlib']}")
+
+    print("\nSlowest imports for brain (cumulative µs):")
+    for cumulative, name in report["brain"]["slowest_imports_us"]:
+        print(f"{cumulative:>10}  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,57 @@
+"""
+Check: clean synthetic data must not raise anomaly alerts.
+
+datagen.py draws every row independently (no spikes, no
+drops), so any anomaly with a score past the alert bar
+(anomaly.ANOMALY_ALERT_SCORE) on its output is a false
+alarm. Runs the growth engine on a few seeds, with and
+without dimension pairs, prints every alert and exits
+with status 1 if there was one.
+
+Run:  python benchmarks/check_anomalies.py --rows 200000 --seeds 5
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import make_sales, parse_dims  # noqa: E402
+from Sort import col_role  # noqa: E402
+from Refine import refine_business_kpis  # noqa: E402
+from category import revenue_growth_engine  # noqa: E402
+from anomaly import ANOMALY_ALERT_SCORE  # noqa: E402
+
+
+def false_alerts(n_rows, seed, cardinality=None, pairs=False):
+    """
+    Anomalies past the alert bar on one clean data set.
+    """
+    df = make_sales(n_rows, seed=seed, cardinality=cardinality)
+    business_kpis = refine_business_kpis(df, col_role(df))
+    results = revenue_growth_engine(df, business_kpis, pairs=pairs)
+
+    anomalies = results["anomalies"]
+    return anomalies[anomalies["score"].abs() >= ANOMALY_ALERT_SCORE]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seeds", type=int, default=5, help="data sets to try (seeds 42, 43, ...)")
+    parser.add_argument("--dims", default="", help='extra dimension cardinalities, e.g. "Store=200"')
+    args = parser.parse_args()
+
+    failed = False
+    for seed in range(42, 42 + args.seeds):
+        for pairs in (False, True):
+            alerts = false_alerts(args.rows, seed, parse_dims(args.dims), pairs)
+            print(f"seed {seed}, pairs={pairs}: {len(alerts)} alert(s)")
+            if len(alerts):
+                print(alerts.to_string(index=False))
+                failed = True
+
+    print("❌ clean data raised alerts" if failed else "✅ no alerts on clean data")
+    sys.exit(1 if failed else 0)
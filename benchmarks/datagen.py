@@ -0,0 +1,154 @@
+"""
+Deterministic synthetic sales data for benchmarks.
+
+Looks like a typical retail export (order id, order / ship date,
+ship mode, segment, region, category, product, quantity, price,
+sales, discount, profit) with knobs for:
+- number of rows (written in chunks, so 100M rows never sit in memory)
+- dimension cardinalities (e.g. Region=50 → 50 regions, skewed sizes)
+- extra filler columns (numbers and free text)
+- currency-formatted revenue strings ("$1,234.50")
+- the date format of the date columns
+
+The same arguments and seed always give the same file.
+
+Run:  python benchmarks/datagen.py sales.csv --rows 1000000 --dims Region=50 --currency
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Default dimensions and their members
+DIMENSIONS = {
+    "Ship Mode": ["Standard Class", "Second Class", "First Class", "Same Day"],
+    "Segment": ["Consumer", "Corporate", "Home Office"],
+    "Region": ["East", "West", "Central", "South"],
+    "Category": ["Technology", "Furniture", "Office Supplies"]
+}
+
+# Distinct products (long tail: a few sell a lot)
+PRODUCTS = 3000
+
+START_DATE = "2021-01-01"
+DAYS = 900
+
+CHUNK_ROWS = 1_000_000
+
+
+def dimension_members(cardinality=None):
+    """
+    Members of every dimension. `cardinality` ({name: count})
+    replaces (or adds) dimensions with generated members.
+    """
+    members = dict(DIMENSIONS)
+    for name, count in (cardinality or {}).items():
+        members[name] = [f"{name} {i + 1}" for i in range(count)]
+    return members
+
+
+def make_sales(n_rows, seed=42, cardinality=None, extra_cols=0, currency=False,
+               date_format="%m/%d/%Y", first_row=0):
+    """
+    One block of synthetic sales rows. `first_row` is the
+    row number of the first row (for chunked writing).
+    """
+    rng = np.random.default_rng(seed)
+
+    # Dates: format each distinct day once, then map to rows
+    day = rng.integers(0, DAYS, n_rows)
+    calendar = pd.date_range(START_DATE, periods=DAYS + 7, freq="D")
+    order_dates = calendar.strftime(date_format).to_numpy()[day]
+    ship_dates = calendar.strftime(date_format).to_numpy()[day + rng.integers(0, 7, n_rows)]
+
+    quantity = rng.integers(1, 10, n_rows)
+    price = rng.uniform(5, 500, n_rows).round(2)
+    sales = (quantity * price).round(2)
+
+    data = {
+        "Row ID": np.arange(first_row, first_row + n_rows),
+        "Order ID": "CA-" + pd.Series(rng.integers(100000, 999999, n_rows)).astype(str),
+        "Order Date": order_dates,
+        "Ship Date": ship_dates
+    }
+
+    # Dimensions with skewed member sizes (1, 1/2, 1/3, ...)
+    for name, values in dimension_members(cardinality).items():
+        weights = 1 / np.arange(1, len(values) + 1)
+        data[name] = np.asarray(values, dtype=object)[
+            rng.choice(len(values), n_rows, p=weights / weights.sum())
+        ]
+
+    products = np.array([f"Product {i}" for i in range(PRODUCTS)], dtype=object)
+    data["Product Name"] = products[rng.zipf(1.5, n_rows) % PRODUCTS]
+
+    data["Quantity"] = quantity
+    data["Unit Price"] = price
+    data["Sales"] = sales
+    data["Discount"] = rng.choice([0, 0.1, 0.2], n_rows)
+    data["Profit"] = (sales * rng.uniform(-0.2, 0.4, n_rows)).round(2)
+
+    # Filler columns: alternately numbers and free text
+    for i in range(extra_cols):
+        if i % 2 == 0:
+            data[f"Metric {i}"] = rng.normal(100, 30, n_rows).round(3)
+        else:
+            data[f"Note {i}"] = "note " + pd.Series(rng.integers(0, 10 ** 6, n_rows)).astype(str)
+
+    df = pd.DataFrame(data)
+
+    if currency:
+        df["Sales"] = df["Sales"].map("${:,.2f}".format)
+
+    return df
+
+
+def write_sales_csv(path, n_rows, seed=42, chunk_rows=CHUNK_ROWS, **options):
+    """
+    Writes `n_rows` synthetic rows to a CSV file, one chunk
+    at a time (chunk i uses seed + i, so the output does not
+    depend on memory or machine).
+    """
+    written = 0
+    chunk = 0
+
+    while written < n_rows or chunk == 0:
+        size = min(chunk_rows, n_rows - written)
+        df = make_sales(size, seed=seed + chunk, first_row=written, **options)
+        df.to_csv(path, mode="w" if chunk == 0 else "a", header=chunk == 0, index=False)
+
+        written += size
+        chunk += 1
+
+    return path
+
+
+def parse_dims(text):
+    """
+    "Region=50,Category=10" → {"Region": 50, "Category": 10}
+    """
+    cardinality = {}
+    for part in filter(None, (text or "").split(",")):
+        name, _, count = part.partition("=")
+        cardinality[name.strip()] = int(count)
+    return cardinality
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV file to write")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dims", default="", help='dimension cardinalities, e.g. "Region=50,Store=2000"')
+    parser.add_argument("--extra-cols", type=int, default=0, help="filler columns to add")
+    parser.add_argument("--currency", action="store_true", help='write Sales as "$1,234.50" strings')
+    parser.add_argument("--date-format", default="%m/%d/%Y")
+    args = parser.parse_args()
+
+    write_sales_csv(
+        args.path, args.rows, seed=args.seed,
+        cardinality=parse_dims(args.dims), extra_cols=args.extra_cols,
+        currency=args.currency, date_format=args.date_format
+    )
+    print(f"✅ {args.rows:,} rows written to {args.path}")
@@ -1,30 +1,68 @@
+import argparse
+
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
 from Sort import col_role
 from Refine import refine_business_kpis
 from category import revenue_growth_engine
+from cache import (
+    load_cached_frame,
+    save_cached_frame,
+    load_cached_inference,
+    save_cached_inference
+)
+from stream import (
+    should_stream,
+    should_sample_first,
+    infer_roles_from_file,
+    needed_columns,
+    compact_dtypes,
+    compact_frame,
+    incremental_growth_engine,
+    is_workbook,
+    sheet_name
+)
 from insight import (
     generate_insights,
     generate_executive_summary,
     generate_next_steps
 )
-from Charts import plot_revenue_trend, plot_pareto
+from Charts import plot_revenue_trend, plot_pareto, get_pyplot, is_headless
+from report import dashboard_pages, export_dashboard
+from profiling import profiled, FORMATS, enable as enable_profiling, write_profile
 
 #Display
 pd.options.display.float_format = '{:,.2f}'.format
 
 #Load file
-def load_data():
-    path = input("\nEnter file path (CSV or Excel): ").strip()
-
+@profiled("load")
+def load_data(path, columns=None, business_kpis=None, sheet=None):
+    """
+    Loads the file (or only `columns` of it).
+    With business_kpis, the columns are also stored
+    compactly (categories, datetimes, float32 when safe).
+    `sheet` picks the sheet of an Excel file (None → first).
+    """
     try:
+        if not path.lower().endswith((".csv", ".xlsx", ".xls")):
+            raise ValueError("Unsupported file format. Use CSV or Excel.")
+
+        # Same file analysed before → read the parsed copy
+        df = load_cached_frame(path, columns, sheet)
+        if df is not None:
+            print("\n⚡ File loaded from cache")
+            return df
+
+        dtypes = compact_dtypes(business_kpis) if business_kpis else None
+
         if path.lower().endswith(".csv"):
-            df = pd.read_csv(path)
-        elif path.lower().endswith((".xlsx", ".xls")):
-            df = pd.read_excel(path)
+            df = pd.read_csv(path, usecols=columns, dtype=dtypes)
         else:
-            raise ValueError("Unsupported file format. Use CSV or Excel.")
+            df = pd.read_excel(path, usecols=columns, dtype=dtypes, sheet_name=0 if sheet is None else sheet)
+
+        if business_kpis:
+            df = compact_frame(df, business_kpis)
+
+        save_cached_frame(path, df, columns, sheet)
 
         print("\n✅ File loaded successfully")
         return df
@@ -34,13 +72,82 @@ def load_data():
         exit()
 
 
+#Detect column roles and business KPIs
+@profiled("detect_roles")
+def detect_roles(df):
+    # Same schema analysed before → reuse the decisions
+    cached = load_cached_inference(df)
+    if cached:
+        print("\n⚡ Column roles reused from cache")
+        return cached
+
+    roles = col_role(df)
+    business_kpis = refine_business_kpis(df, roles)
+
+    save_cached_inference(df, roles, business_kpis)
+    return roles, business_kpis
+
+
+#Detect roles from a sample (large files)
+@profiled("sample_roles")
+def sample_roles(path, sheet=None):
+    try:
+        roles, business_kpis, sample = infer_roles_from_file(path, sheet=sheet)
+
+        if sample is None:
+            print("\n⚡ Column roles reused from cache")
+        else:
+            print(f"\n✅ Column roles detected on {len(sample)} sampled rows")
+        return roles, business_kpis
+
+    except Exception as e:
+        print(f"\n❌ Failed to read file: {e}")
+        exit()
+
+
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Interactive revenue analysis of a CSV / Excel file.")
+    parser.add_argument("--profile", default=None, help="record phase timings and memory to this file")
+    parser.add_argument("--profile-format", default="json", choices=FORMATS, help="json or chrome (trace viewer)")
+    parser.add_argument("--sheet", default=None, help="Excel sheet to analyse: name or position (0 = first)")
+    parser.add_argument("--pairs", action="store_true",
+                        help="also analyse every pair of dimensions (e.g. store × category anomalies)")
+    args = parser.parse_args()
+
+    if args.profile:
+        enable_profiling(args.profile, args.profile_format)
+
 #load data
-    df = load_data()
+    path = input("\nEnter file path (CSV or Excel): ").strip()
+
+    # Excel: the chosen sheet, by its real name
+    sheet = args.sheet
+    if sheet is not None and is_workbook(path):
+        try:
+            sheet = sheet_name(path, sheet)
+        except Exception as e:
+            print(f"\n❌ Failed to open workbook: {e}")
+            exit()
+
+    # Large files: roles are detected on a random sample,
+    # then only the needed columns are loaded.
+    # Huge CSV files and big Excel workbooks are not
+    # loaded at all: revenue is aggregated chunk by
+    # chunk (streaming mode)
+    streaming = should_stream(path)
+    sample_first = streaming or should_sample_first(path)
+
+    if streaming:
+        print("\n📦 Large file detected – using streaming mode")
+
+    if sample_first:
+        roles, business_kpis = sample_roles(path, sheet)
+    else:
+        df = load_data(path, sheet=sheet)
+        roles, business_kpis = detect_roles(df)
 
 #Column
-    roles = col_role(df)
 
     print("\n--- DATE DETECTION ---")
     print(roles["date"])
@@ -57,8 +164,6 @@ if __name__ == "__main__":
     # -----------------------------
     # Phase 3 – Step 1: Business KPIs
     # -----------------------------
-    business_kpis = refine_business_kpis(df, roles)
-
     print("\n--- BUSINESS KPIs ---")
     for k, v in business_kpis.items():
         if not k.startswith("_"):
@@ -67,11 +172,24 @@ if __name__ == "__main__":
     # -----------------------------
     # Phase 3 – Step 2: Growth Engine
     # -----------------------------
-    results = revenue_growth_engine(df, business_kpis)
+    if streaming:
+        # Partial sums are kept between runs: only new rows are read
+        results = incremental_growth_engine(path, business_kpis, pairs=args.pairs, sheet=sheet)
+    else:
+        if sample_first:
+            # Only the needed columns, stored compactly
+            df = load_data(path, columns=needed_columns(business_kpis), business_kpis=business_kpis, sheet=sheet)
+        results = revenue_growth_engine(df, business_kpis, pairs=args.pairs)
 
     print("\n--- TOTAL REVENUE ---")
     print(results["total_revenue"])
 
+    if results["measure_totals"]:
+        print("\n--- OTHER MEASURES ---")
+        for name, value in results["measure_totals"].items():
+            if name != business_kpis["revenue"]:
+                print(f"{name} : {value:,}" if pd.notna(value) else f"{name} : -")
+
     print("\n--- TIME GRAIN ---")
     print(results["time_grain"])
 
@@ -101,15 +219,19 @@ if __name__ == "__main__":
     # INTERACTIVE CHART MENU
     # -----------------------------
     dims = list(results["by_dimension"].keys())
+    grains = list(results["revenue_by_grain"].keys())
+    grain = results["time_grain"]
     viewed_any_chart = False
 
     while True:
         print("\n📊 What do you want to view?\n")
-        print("1. Revenue Trend")
+        print(f"1. Revenue Trend ({grain})")
 
         for i, dim in enumerate(dims, start=2):
             print(f"{i}. Pareto – {dim}")
 
+        print("G. Change time grain")
+        print("D. What changed in the last period")
         print("0. Exit")
 
         choice = input("\nEnter choice number: ").strip()
@@ -117,26 +239,55 @@ if __name__ == "__main__":
         if choice == "0":
             break
 
+        elif choice.upper() == "G":
+            # Every grain was rolled up already: switching is instant
+            for i, name in enumerate(grains, start=1):
+                print(f"{i}. {name}")
+
+            pick = input("Grain number: ").strip()
+            if pick.isdigit() and 1 <= int(pick) <= len(grains):
+                grain = grains[int(pick) - 1]
+                print(f"✅ Revenue trend now shown {grain.lower()}")
+            else:
+                print("❌ Invalid choice. Try again.")
+
+        elif choice.upper() == "D":
+            # Answered from the dimension × period cube (no rows re-read)
+            for dim, table in results["contribution_to_change"].items():
+                if table.empty:
+                    continue
+                print(f"\n{dim} — {results['change_period']:%Y-%m-%d} vs the period before ({results['time_grain']}):")
+                for _, row in pd.concat([table.head(3), table.tail(3)]).drop_duplicates(dim).iterrows():
+                    print(f"   {str(row[dim]):<25} {row['change']:>15,.2f}   ({row['contribution_pct']:.1f}% of the change)")
+
+        elif choice.isdigit() and 1 <= int(choice) <= len(dims) + 1 and is_headless():
+            # Headless runs (servers, batch hosts) can't open chart windows
+            print("❌ No screen available to show charts. Export the PDF dashboard instead.")
+
         elif choice == "1":
+            plt = get_pyplot()
             fig, ax = plt.subplots(figsize=(12, 5))
             plot_revenue_trend(
-                results["revenue_over_time"],
+                results["revenue_by_grain"][grain],
                 business_kpis["date"],
                 business_kpis["revenue"],
                 ax,
-                insights
+                insights,
+                grain=grain
             )
             plt.show()
             viewed_any_chart = True
 
         elif choice.isdigit() and 2 <= int(choice) <= len(dims) + 1:
             dim = dims[int(choice) - 2]
+            plt = get_pyplot()
             fig, ax = plt.subplots(figsize=(12, 5))
             plot_pareto(
                 results["by_dimension"][dim],
                 dim,
                 business_kpis["revenue"],
-                ax
+                ax,
+                other=True
             )
             plt.show()
             viewed_any_chart = True
@@ -150,32 +301,19 @@ if __name__ == "__main__":
     save = input("\nDownload full dashboard as PDF?\n1. Yes\n2. No\nChoice: ").strip()
 
     if save == "1":
-        with PdfPages("analytics_dashboard.pdf") as pdf:
+        # Pages are drawn off-screen, one figure reused
+        timings = export_dashboard(
+            dashboard_pages(results, business_kpis, insights, grain),
+            "analytics_dashboard.pdf"
+        )
 
-            # Revenue trend
-            fig, ax = plt.subplots(figsize=(14, 5))
-            plot_revenue_trend(
-                results["revenue_over_time"],
-                business_kpis["date"],
-                business_kpis["revenue"],
-                ax,
-                insights
-            )
-            pdf.savefig(fig)
-            plt.close(fig)
-
-            # Pareto charts
-            for dim in dims:
-                fig, ax = plt.subplots(figsize=(14, 5))
-                plot_pareto(
-                    results["by_dimension"][dim],
-                    dim,
-                    business_kpis["revenue"],
-                    ax
-                )
-                pdf.savefig(fig)
-                plt.close(fig)
+        for name, seconds in timings:
+            print(f"   {name:<30} {seconds:.2f}s")
 
         print("\n📄 analytics_dashboard.pdf saved successfully")
 
+    if args.profile:
+        write_profile()
+        print(f"\n⏱️ Profile saved to {args.profile}")
+
     print("\n👋 Session complete. Goodbye.")
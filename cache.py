@@ -0,0 +1,426 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from Sort import profile_columns
+from dates import parse_dates
+
+# --------------------------------------------------
+# DATASET CACHE
+# Parsing a big CSV / Excel file is slow, and we keep
+# analysing the same files. The first load stores the
+# parsed, typed data in a fast binary format (Feather,
+# or a pickle if pyarrow is not installed). Next time
+# the same file is read straight from the cache.
+# Big Excel sheets are written to the cache piece by
+# piece and can be read back in chunks.
+# --------------------------------------------------
+
+CACHE_DIR = os.environ.get(
+    "AUTOINSIGHT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "autoinsight")
+)
+
+# Total size the cache may use before old entries are removed
+CACHE_MAX_BYTES = int(os.environ.get("AUTOINSIGHT_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+
+# Set AUTOINSIGHT_CACHE=0 to switch caching off
+CACHE_ENABLED = os.environ.get("AUTOINSIGHT_CACHE", "1") != "0"
+
+# Bytes hashed at the start, middle and end of a file
+HASH_BLOCK_BYTES = 1024 ** 2
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def file_fingerprint(path):
+    """
+    Identifies one version of a file: its path, size,
+    modification time and a hash of its content.
+    To stay fast on huge files, only the first, middle
+    and last megabyte are hashed (size and mtime catch
+    the rest).
+    """
+    stat = os.stat(path)
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(os.path.abspath(path).encode())
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+    with open(path, "rb") as f:
+        for offset in (0, stat.st_size // 2, max(0, stat.st_size - HASH_BLOCK_BYTES)):
+            f.seek(offset)
+            digest.update(f.read(HASH_BLOCK_BYTES))
+
+    return digest.hexdigest()
+
+
+def _entry_path(path, columns, sheet=None):
+    """
+    Cache file for one file version + column selection.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(file_fingerprint(path).encode())
+    digest.update(repr(sorted(columns) if columns else None).encode())
+    digest.update(repr(sheet).encode())
+
+    suffix = ".feather" if _has_pyarrow() else ".pkl"
+    return os.path.join(CACHE_DIR, digest.hexdigest() + suffix)
+
+
+def load_cached_frame(path, columns=None, sheet=None):
+    """
+    Returns the cached DataFrame for this file,
+    or None if it has not been cached yet.
+    """
+    if not CACHE_ENABLED:
+        return None
+
+    entry = _entry_path(path, columns, sheet)
+    if not os.path.exists(entry):
+        return None
+
+    try:
+        if entry.endswith(".feather"):
+            df = pd.read_feather(entry)
+        else:
+            df = pd.read_pickle(entry)
+    except Exception:
+        # Broken entry: forget it and reload from the source
+        os.remove(entry)
+        return None
+
+    # Mark the entry as recently used (eviction removes the oldest)
+    os.utime(entry)
+    return df
+
+
+def save_cached_frame(path, df, columns=None, sheet=None, max_bytes=CACHE_MAX_BYTES):
+    """
+    Stores a parsed DataFrame in the cache.
+    Returns True if it was stored.
+    """
+    if not CACHE_ENABLED:
+        return False
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entry = _entry_path(path, columns, sheet)
+    tmp = entry + ".tmp"
+
+    try:
+        if entry.endswith(".feather"):
+            df.reset_index(drop=True).to_feather(tmp)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, entry)
+    except Exception:
+        # Some columns (e.g. mixed types) can't be stored: just skip caching
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+    evict_cache(max_bytes)
+    return os.path.exists(entry)
+
+
+def _arrow_piece(df):
+    """
+    One piece of a file → Arrow table. Text mixed with
+    numbers is kept as text.
+    """
+    import pyarrow as pa
+
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            values = df[col]
+            df[col] = values.where(values.isna(), values.astype(str))
+
+    return pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+
+
+def _common_schema(schema, other):
+    """
+    Column types that fit two pieces: a column empty in
+    one piece takes the type of the other, whole numbers
+    and decimals become decimals (float64), and any other
+    mix becomes text.
+    """
+    import pyarrow as pa
+
+    def is_number(t):
+        return pa.types.is_integer(t) or pa.types.is_floating(t)
+
+    fields = []
+    for field in schema:
+        new = other.field(field.name).type
+        if new == field.type or pa.types.is_null(new):
+            fields.append(field)
+        elif pa.types.is_null(field.type):
+            fields.append(pa.field(field.name, new))
+        elif is_number(field.type) and is_number(new):
+            fields.append(pa.field(field.name, pa.float64()))
+        else:
+            fields.append(pa.field(field.name, pa.string()))
+
+    return pa.schema(fields)
+
+
+def save_cached_pieces(path, pieces, sheet=None, max_bytes=CACHE_MAX_BYTES):
+    """
+    Stores a file that is read in pieces (DataFrames with
+    the same columns, e.g. the batches of an Excel sheet)
+    as one cache entry, the same one save_cached_frame
+    would write for the whole file. Every piece is written
+    as soon as it arrives, so only one piece is ever in
+    memory. When a piece does not fit the column types
+    written so far (e.g. decimals after 50,000 whole
+    numbers), the types are widened and what was written
+    is copied over once. Needs pyarrow. Returns True if
+    it was stored.
+    """
+    if not CACHE_ENABLED or not _has_pyarrow():
+        return False
+
+    import pyarrow as pa
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entry = _entry_path(path, None, sheet)
+
+    # This file could not be stored before: don't read it all again for nothing
+    failed = entry + ".failed"
+    if os.path.exists(failed):
+        return False
+
+    options = pa.ipc.IpcWriteOptions(compression="lz4")
+    tmp = entry + ".tmp"
+    writer = None
+
+    try:
+        for piece in pieces:
+            table = _arrow_piece(piece)
+
+            if writer is None:
+                schema = table.schema
+                writer = pa.ipc.new_file(tmp, schema, options=options)
+
+            elif not table.schema.equals(schema):
+                wider = _common_schema(schema, table.schema)
+                if not wider.equals(schema):
+                    # Copy what was written so far with the wider types
+                    writer.close()
+                    os.replace(tmp, tmp + ".old")
+                    schema = wider
+                    writer = pa.ipc.new_file(tmp, schema, options=options)
+                    with pa.memory_map(tmp + ".old") as source:
+                        reader = pa.ipc.open_file(source)
+                        for i in range(reader.num_record_batches):
+                            writer.write_table(pa.Table.from_batches([reader.get_batch(i)]).cast(schema))
+                    os.remove(tmp + ".old")
+
+            writer.write_table(table.cast(schema))
+
+        if writer is None:
+            return False
+        writer.close()
+        os.replace(tmp, entry)
+    except Exception:
+        # The pieces can't be stored: no cache (remembered for next time)
+        if writer is not None:
+            writer.close()
+        for leftover in (tmp, tmp + ".old"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        open(failed, "w").close()
+        return False
+
+    evict_cache(max_bytes)
+    return os.path.exists(entry)
+
+
+def open_cached_pieces(path, columns=None, sheet=None, chunksize=100_000):
+    """
+    Reads the cached copy of a whole file (Feather entry)
+    back in DataFrames of about `chunksize` rows, only
+    with `columns` (all when None). Returns None if there
+    is no such entry.
+    """
+    if not CACHE_ENABLED or not _has_pyarrow():
+        return None
+
+    entry = _entry_path(path, None, sheet)
+    if not os.path.exists(entry):
+        return None
+
+    import pyarrow as pa
+
+    os.utime(entry)
+
+    def pieces():
+        with pa.memory_map(entry) as source:
+            reader = pa.ipc.open_file(source)
+            names = [name for name in reader.schema.names if columns is None or name in columns]
+
+            batches, rows, start = [], 0, 0
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i).select(names)
+                batches.append(batch)
+                rows += batch.num_rows
+
+                if rows >= chunksize or i == reader.num_record_batches - 1:
+                    df = pa.Table.from_batches(batches, schema=batch.schema).to_pandas()
+                    df.index = pd.RangeIndex(start, start + len(df))
+                    yield df
+                    batches, rows, start = [], 0, start + len(df)
+
+    return pieces()
+
+
+def evict_cache(max_bytes=CACHE_MAX_BYTES):
+    """
+    Removes the least recently used dataset entries
+    until the cache fits in `max_bytes`.
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        # Only dataset entries (<hash>.feather / <hash>.pkl), never
+        # the saved aggregate states of incremental runs
+        stem, suffix = os.path.splitext(name)
+        if suffix in (".feather", ".pkl") and len(stem) == 32 and all(c in "0123456789abcdef" for c in stem):
+            full = os.path.join(CACHE_DIR, name)
+            stat = os.stat(full)
+            entries.append((stat.st_mtime, stat.st_size, full))
+
+    total = sum(size for _, size, _ in entries)
+
+    for _, size, full in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(full)
+        total -= size
+
+
+# --------------------------------------------------
+# SCHEMA CACHE
+# The same schema (same columns, new rows) is analysed
+# every day. Column roles and business KPIs are stored
+# per schema and reused after a quick sanity check.
+# --------------------------------------------------
+
+# Rows used to check that cached decisions still hold
+CHECK_ROWS = 500
+
+
+def _kind(dtype):
+    """
+    Coarse type of a column (int vs float does not matter:
+    a few missing values turn ints into floats).
+    """
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "number"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    return "text"
+
+
+def schema_fingerprint(df):
+    """
+    Hash of the column names and their coarse types.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for col, dtype in df.dtypes.items():
+        digest.update(f"{col}\0{_kind(dtype)}\n".encode())
+    return digest.hexdigest()
+
+
+def _schema_entry(df):
+    return os.path.join(CACHE_DIR, "schema-" + schema_fingerprint(df) + ".json")
+
+
+def inference_still_holds(df, roles, business_kpis, rows=CHECK_ROWS):
+    """
+    Cheap check of cached decisions on a few rows:
+    - the date column still parses as dates
+    - revenue / quantity / profit are still numbers
+    - dimensions are still text
+    """
+    sample = df.sample(rows, random_state=42) if len(df) > rows else df
+    if sample.empty:
+        return False
+
+    needed = [business_kpis["date"], business_kpis["revenue"], business_kpis["quantity"],
+              business_kpis["profit"]] + business_kpis["dimensions"]
+    if any(col and col not in sample.columns for col in needed):
+        return False
+
+    profile = profile_columns(sample)
+
+    if business_kpis["date"]:
+        dates = parse_dates(sample[business_kpis["date"]], business_kpis.get("date_format"))
+        if dates.notna().mean() < 0.9:
+            return False
+
+    for key in ("revenue", "quantity", "profit"):
+        col = business_kpis[key]
+        if col and profile[col]["numeric_rate"] < 0.6:
+            return False
+
+    for col in business_kpis["dimensions"]:
+        if profile[col]["numeric_rate"] >= 0.6:
+            return False
+
+    return True
+
+
+def load_cached_inference(df):
+    """
+    Returns (roles, business_kpis) saved for this schema,
+    or None if there is nothing cached or the cached
+    decisions no longer fit the data.
+    """
+    if not CACHE_ENABLED:
+        return None
+
+    entry = _schema_entry(df)
+    if not os.path.exists(entry):
+        return None
+
+    try:
+        with open(entry) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not inference_still_holds(df, saved["roles"], saved["business_kpis"]):
+        return None
+
+    return saved["roles"], saved["business_kpis"]
+
+
+def save_cached_inference(df, roles, business_kpis):
+    """
+    Stores column roles and business KPIs for this schema.
+    """
+    if not CACHE_ENABLED:
+        return
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entry = _schema_entry(df)
+
+    with open(entry + ".tmp", "w") as f:
+        # numpy numbers (e.g. confidence scores) are saved as plain floats
+        json.dump({"roles": roles, "business_kpis": business_kpis}, f, default=float)
+    os.replace(entry + ".tmp", entry)
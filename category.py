@@ -1,85 +1,443 @@
+from itertools import combinations
+
+import numpy as np
 import pandas as pd
 
-def revenue_growth_engine(df, business_kpis):
+from dates import parse_dates
+from Sort import currency_pattern
+from profiling import profiled
+from anomaly import detect_anomalies, complete_periods
+from sketches import topk_prune, topk_merge
+
+
+def empty_growth_results():
     """
-    This function helps us understand revenue.
-    It calculates total revenue, growth over time,
-    and shows which categories make the most money.
+    The empty results dictionary that every
+    growth engine run fills in step by step.
     """
-
-    # -----------------------------------
-    # This dictionary will store everything
-    # we calculate step by step
-    # -----------------------------------
-    results = {
+    return {
         "total_revenue": None,        # total money earned
         "time_grain": None,           # weekly or monthly
         "revenue_over_time": None,    # revenue trend
         "growth_over_time": None,     # growth percentage
+        "revenue_by_grain": {},       # revenue trend at every grain (Daily ... Yearly)
+        "measure_totals": {},         # rows, quantity, profit, margin %, average price
         "by_dimension": {},           # revenue by category
+        "by_dimension_measures": {},  # the same measures per member of each dimension
+        "by_dimension_pairs": {},     # revenue by two categories (optional)
+        "dimension_cube": {},         # revenue per member × period (default grain)
+        "contribution_to_change": {}, # what each member added to the last change
+        "change_period": None,        # the period that change ends in (last complete one)
+        "anomalies": None,            # unusual periods in the total / member series
         "top_contributors": {},       # top 3 contributors
+        "dimension_error": {},        # approximate dimensions: how far each sum may be off
         "warnings": []                # problems if any
     }
 
-    # -----------------------------------
-    # Getting column names from input
-    # -----------------------------------
-    date_col = business_kpis["date"]        # date column name
-    revenue_col = business_kpis["revenue"]  # revenue column name
-    dimensions = business_kpis["dimensions"]  # category columns
 
-    # -----------------------------------
-    # Safety check (very important!)
-    # -----------------------------------
-    if not date_col or not revenue_col:
-        # If we don’t have date or revenue,
-        # we cannot do any analysis
-        results["warnings"].append("Missing date or revenue column")
-        return results
+def cross_codes(codes_a, labels_a, codes_b, labels_b, names):
+    """
+    Codes of two groupings → codes of their combinations
+    (only combinations that actually occur get a code).
+    Returns (codes, MultiIndex of the combinations).
+    """
+    both = (codes_a >= 0) & (codes_b >= 0)
+    combined = codes_a[both].astype(np.int64) * len(labels_b) + codes_b[both]
+    size = len(labels_a) * len(labels_b)
 
-    # -----------------------------------
-    # Keep only required columns
-    # -----------------------------------
-    data = df[[date_col, revenue_col] + dimensions].copy()
+    if size <= len(combined):
+        # Few possible combinations: a lookup table instead of hashing
+        seen = np.flatnonzero(np.bincount(combined, minlength=size))
+        lookup = np.full(size, -1)
+        lookup[seen] = np.arange(len(seen))
+        pair_codes = lookup[combined]
+    else:
+        pair_codes, seen = pd.factorize(combined)
+
+    codes = np.full(len(both), -1)
+    codes[both] = pair_codes
+
+    # Both label lists are already unique: no need to hash them again
+    labels = pd.MultiIndex(
+        levels=[labels_a, labels_b],
+        codes=[seen // len(labels_b), seen % len(labels_b)],
+        names=names,
+        verify_integrity=False
+    )
+    return codes, labels
+
+
+def sum_by_codes(codes, labels, weights=None, dtype=None):
+    """
+    One np.bincount: sums `weights` (or counts rows)
+    per code, as a Series indexed by `labels`.
+    Rows with code -1 (missing) are left out.
+    Integer `dtype` sums are rounded back to integers.
+    """
+    valid = codes >= 0
+    if not valid.all():
+        codes = codes[valid]
+        weights = None if weights is None else weights[valid]
+
+    sums = np.bincount(codes, weights=weights, minlength=len(labels))
+
+    if dtype is not None and np.issubdtype(dtype, np.integer):
+        sums = np.rint(sums).astype(dtype)
+
+    return pd.Series(sums, index=labels)
+
+
+@profiled("grouping_sets")
+def grouping_sets(frame, dimensions, values, pairs=False, periods=None, measures=None):
+    """
+    Sums `values` per member of every dimension
+    (and optionally every pair of dimensions)
+    with one np.bincount per grouping.
+
+    Each dimension is turned into integer codes once
+    (pd.factorize) and every grouping reuses them.
+
+    With `periods` (the period of every row, e.g. its day)
+    every dimension (and pair) is also summed per
+    member × period: the dimension × time cube.
+    A pair's members are (member_a, member_b) tuples.
+
+    Groupings are summed one after the other, so memory
+    stays at about one column of codes, whatever the
+    number of dimensions and pairs.
+
+    With `measures` ({name: values}) the rows and every
+    measure are also counted / summed per member of every
+    dimension, reusing the same codes (one more bincount
+    per measure, no new grouping).
+    Returns {dim: Series}, {(dim_a, dim_b): Series},
+    {dim: Series indexed by (member, period)},
+    {(dim_a, dim_b): Series indexed by (member, period)} and
+    {dim: DataFrame of rows and measures}.
+    """
+    values = np.asarray(values)
+    weights = values.astype("float64")
+
+    # Other measures as plain floats, converted once
+    measure_weights = {}
+    for name, measure in (measures or {}).items():
+        measure = np.asarray(measure)
+        measure_weights[name] = (np.nan_to_num(measure.astype("float64")), measure.dtype)
+
+    found = {"dim": {}, "pair": {}, "cube": {}, "pair_cube": {}}
+
+    # Integer codes per dimension (-1 = missing)
+    codes, labels = {}, {}
+    for dim in dimensions:
+        codes[dim], labels[dim] = pd.factorize(frame[dim])
+
+        # Category columns: plain labels, like any other column
+        if isinstance(labels[dim].dtype, pd.CategoricalDtype):
+            labels[dim] = labels[dim].astype(labels[dim].categories.dtype)
+
+        found["dim"][dim] = sum_by_codes(codes[dim], pd.Index(labels[dim], name=dim), weights, values.dtype)
+
+    # Each dimension × period too: the dimension × time cube
+    if periods is not None:
+        period_codes, period_labels = pd.factorize(periods)
+        for dim in dimensions:
+            cube_codes, cube_labels = cross_codes(codes[dim], labels[dim], period_codes, period_labels, [dim, periods.name])
+            found["cube"][dim] = sum_by_codes(cube_codes, cube_labels, weights, values.dtype)
+
+    # Each pair of dimensions (and pair × period) is one more set of codes,
+    # built and summed one at a time
+    if pairs:
+        for a, b in combinations(dimensions, 2):
+            pair_codes, pair_labels = cross_codes(codes[a], labels[a], codes[b], labels[b], [a, b])
+            found["pair"][(a, b)] = sum_by_codes(pair_codes, pair_labels, weights, values.dtype)
+
+            if periods is not None:
+                cube_codes, cube_labels = cross_codes(
+                    pair_codes, pair_labels.to_flat_index(), period_codes, period_labels,
+                    [" × ".join((a, b)), periods.name]
+                )
+                found["pair_cube"][(a, b)] = sum_by_codes(cube_codes, cube_labels, weights, values.dtype)
+
+    # Rows and other measures per member: same codes as the
+    # dimensions above, one bincount each
+    by_measure = {}
+    if measures is not None:
+        for dim in dimensions:
+            index = pd.Index(labels[dim], name=dim)
+            columns = {"rows": sum_by_codes(codes[dim], index)}
+            for name, (measure, dtype) in measure_weights.items():
+                columns[name] = sum_by_codes(codes[dim], index, measure, dtype)
+
+            by_measure[dim] = pd.DataFrame(columns)
+
+    return found["dim"], found["pair"], found["cube"], found["pair_cube"], by_measure
+
+
+def to_amounts(series):
+    """
+    Money column → numbers. Text like "$1,234.50" is
+    cleaned (each distinct string once) and converted;
+    anything that is not a number becomes missing.
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        # Compact columns (float32 / int32) are summed in 64 bits
+        if series.dtype.kind in "fiu" and series.dtype.itemsize < 8:
+            return series.astype("float64" if series.dtype.kind == "f" else "int64")
+        return series
+
+    codes, uniques = pd.factorize(series)
+    cleaned = pd.Series(uniques, dtype=object).astype(str).str.replace(currency_pattern, "", regex=True)
+    amounts = pd.to_numeric(cleaned, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+    values = np.where(codes >= 0, amounts[codes] if len(amounts) else np.nan, np.nan)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def measure_columns(business_kpis):
+    """
+    The other measures summed next to revenue:
+    the quantity and profit columns, when resolved.
+    """
+    columns = [business_kpis.get("quantity"), business_kpis.get("profit")]
+    return list(dict.fromkeys(c for c in columns if c and c != business_kpis["revenue"]))
+
+
+@profiled("aggregate_revenue")
+def aggregate_revenue(df, business_kpis, pairs=False):
+    """
+    Turns a block of rows into small partial sums.
+    Partial sums from different blocks can be merged,
+    so a huge file can be processed piece by piece
+    and memory only grows with the number of groups.
+    """
+
+    date_col = business_kpis["date"]
+    revenue_col = business_kpis["revenue"]
+    dimensions = business_kpis["dimensions"]
 
     # Convert date column into datetime format
-    data[date_col] = pd.to_datetime(data[date_col], errors="coerce")
+    # (using the format detected by col_role, if any)
+    dates = parse_dates(df[date_col], business_kpis.get("date_format"))
+    revenue = to_amounts(df[revenue_col])
 
     # Remove rows where date or revenue is missing
-    data = data.dropna(subset=[date_col, revenue_col])
+    keep = dates.notna() & revenue.notna()
+    dates = dates[keep]
+    revenue = revenue[keep]
 
-    # -----------------------------------
-    # Calculate TOTAL revenue
-    # -----------------------------------
-    # Add all revenue values and round to 2 decimals
-    results["total_revenue"] = round(data[revenue_col].sum(), 2)
+    # Revenue per calendar day (the smallest time bucket we need)
+    days = dates.dt.normalize().rename(date_col)
+    daily = revenue.groupby(days).sum()
+    daily.index.name = date_col
 
-    # -----------------------------------
-    # Decide if we use Weekly or Monthly data
-    # -----------------------------------
-    # Find how many days the data covers
-    span_days = (data[date_col].max() - data[date_col].min()).days
+    # Quantity / profit of the same rows (missing counts as 0)
+    measures = {
+        col: to_amounts(df[col])[keep].to_numpy()
+        for col in measure_columns(business_kpis) if col in df.columns
+    }
 
-    if span_days > 120:
-        # Long time range → Monthly view
-        freq = "ME"   # month-end
-        results["time_grain"] = "Monthly"
-    else:
-        # Short time range → Weekly view
-        freq = "W"
-        results["time_grain"] = "Weekly"
+    # Revenue per member of each dimension (and pair of dimensions),
+    # per member and day (rolled up to any grain later), and the
+    # other measures per member, all on the same dimension codes
+    by_dim, by_pair, by_day, by_pair_day, by_measure = grouping_sets(
+        df.loc[keep], dimensions, revenue.to_numpy(), pairs=pairs, periods=days, measures=measures
+    )
 
-    # -----------------------------------
-    # Revenue over time
-    # -----------------------------------
-    # Group revenue by week or month
-    rev_time = (
-        data
-        .set_index(date_col)
-        .resample(freq)[revenue_col]
-        .sum()
-        .reset_index()
+    return {
+        "rows": int(keep.sum()),
+        "revenue_total": revenue.sum(),
+        "measure_totals": {col: np.nansum(values) for col, values in measures.items()},
+        "date_min": dates.min(),
+        "date_max": dates.max(),
+        "daily": daily,
+        "by_dimension": by_dim,
+        "by_dimension_pairs": by_pair,
+        "by_dimension_day": by_day,
+        "by_pair_day": by_pair_day,
+        "by_dimension_measures": by_measure
+    }
+
+
+def merge_revenue_aggregates(left, right, top_k=None):
+    """
+    Adds two partial aggregates together.
+    With top_k, dimensions (and pairs) with more members
+    than that only keep their top_k biggest members, and
+    the possible error is tracked in "dimension_error".
+    """
+
+    def earliest(a, b):
+        return b if pd.isna(a) else a if pd.isna(b) else min(a, b)
+
+    def latest(a, b):
+        return b if pd.isna(a) else a if pd.isna(b) else max(a, b)
+
+    merged = {
+        "rows": left["rows"] + right["rows"],
+        "revenue_total": left["revenue_total"] + right["revenue_total"],
+        "measure_totals": {
+            col: total + right["measure_totals"].get(col, 0) for col, total in left["measure_totals"].items()
+        },
+        "date_min": earliest(left["date_min"], right["date_min"]),
+        "date_max": latest(left["date_max"], right["date_max"]),
+        "daily": left["daily"].add(right["daily"], fill_value=0),
+        "by_dimension": {},
+        "by_dimension_pairs": {},
+        "by_dimension_day": {},
+        "by_pair_day": {},
+        "by_dimension_measures": {},
+        "dimension_error": {}
+    }
+
+    left_error = left.get("dimension_error", {})
+    right_error = right.get("dimension_error", {})
+
+    for part in ("by_dimension", "by_dimension_pairs"):
+        for key in left[part]:
+            merged[part][key], error = topk_merge(
+                left[part][key], left_error.get(key, 0.0),
+                right[part][key], right_error.get(key, 0.0),
+                capacity=top_k
+            )
+            if error:
+                merged["dimension_error"][key] = error
+
+    # Member × day sums, for the members that were kept
+    for dim in left["by_dimension_day"]:
+        merged["by_dimension_day"][dim] = add_cells(
+            left["by_dimension_day"][dim], right["by_dimension_day"][dim],
+            merged["by_dimension"][dim].index if top_k is not None else None
+        )
+
+    # Same for pairs (members are (member_a, member_b) tuples)
+    for pair in left["by_pair_day"]:
+        merged["by_pair_day"][pair] = add_cells(
+            left["by_pair_day"][pair], right["by_pair_day"][pair],
+            merged["by_dimension_pairs"][pair].index.to_flat_index() if top_k is not None else None
+        )
+
+    # Rows and other measures, for the same members
+    for dim, table in left["by_dimension_measures"].items():
+        if top_k is None:
+            merged["by_dimension_measures"][dim] = table.add(right["by_dimension_measures"][dim], fill_value=0)
+        else:
+            kept = merged["by_dimension"][dim].index
+            merged["by_dimension_measures"][dim] = (
+                table.reindex(kept, fill_value=0) + right["by_dimension_measures"][dim].reindex(kept, fill_value=0)
+            )
+
+    return merged
+
+
+def add_cells(left, right, members=None):
+    """
+    Adds two member × period tables, keeping only
+    `members` (None = all of them). Both sides are
+    matched by their integer codes, which is much faster
+    than aligning two big MultiIndexes label by label.
+    """
+    levels, codes = [], []
+    for level in range(2):
+        if level == 0 and members is not None:
+            labels = pd.Index(members)
+        else:
+            labels = left.index.levels[level].append(right.index.levels[level]).unique()
+
+        # Code of every cell in the shared list of labels (-1 = not kept)
+        codes.append(np.concatenate([
+            labels.get_indexer(side.index.levels[level])[side.index.codes[level]]
+            for side in (left, right)
+        ]))
+        levels.append(labels)
+
+    values = np.concatenate([left.to_numpy(dtype="float64"), right.to_numpy(dtype="float64")])
+    kept = codes[0] >= 0
+
+    # Same (member, period) on both sides → one cell
+    cells, seen = pd.factorize(codes[0][kept].astype(np.int64) * len(levels[1]) + codes[1][kept])
+    sums = np.bincount(cells, weights=values[kept], minlength=len(seen))
+
+    index = pd.MultiIndex(
+        levels=levels,
+        codes=[seen // len(levels[1]), seen % len(levels[1])],
+        names=left.index.names,
+        verify_integrity=False
     )
+    return pd.Series(sums, index=index)
+
+
+def keep_members(cells, members, top_k=None):
+    """
+    Member × period sums of only the given members
+    (nothing to drop when members are not limited).
+    """
+    if top_k is None:
+        return cells
+
+    index = cells.index
+    kept = index.levels[0].isin(members)[index.codes[0]]
+    return cells if kept.all() else cells[kept]
+
+
+def prune_revenue_aggregate(agg, top_k=None):
+    """
+    Keeps only the top_k biggest members of every
+    dimension (and pair) in a partial aggregate.
+    """
+    if top_k is None:
+        return agg
+
+    errors = dict(agg.get("dimension_error", {}))
+
+    for part in ("by_dimension", "by_dimension_pairs"):
+        for key, sums in agg[part].items():
+            agg[part][key], error = topk_prune(sums, errors.get(key, 0.0), top_k)
+            if error:
+                errors[key] = error
+
+    for dim, cells in agg["by_dimension_day"].items():
+        agg["by_dimension_day"][dim] = keep_members(cells, agg["by_dimension"][dim].index, top_k)
+
+    for pair, cells in agg["by_pair_day"].items():
+        agg["by_pair_day"][pair] = keep_members(cells, agg["by_dimension_pairs"][pair].index.to_flat_index(), top_k)
+
+    for dim, table in agg["by_dimension_measures"].items():
+        agg["by_dimension_measures"][dim] = table.reindex(agg["by_dimension"][dim].index)
+
+    agg["dimension_error"] = errors
+    return agg
+
+
+# Every time grain the trend can be shown at (pandas frequency)
+GRAINS = {
+    "Daily": "D",
+    "Weekly": "W",
+    "Monthly": "ME",
+    "Quarterly": "QE",
+    "Yearly": "YE"
+}
+
+
+def rollup_grains(daily):
+    """
+    Revenue per day → revenue per period for every grain.
+    Each grain is rolled up from the smallest finer one
+    (days → weeks / months → quarters → years), so the raw
+    rows are never touched again.
+    """
+    sums = {"Daily": daily.resample(GRAINS["Daily"]).sum()}
+    sums["Weekly"] = sums["Daily"].resample(GRAINS["Weekly"]).sum()
+    sums["Monthly"] = sums["Daily"].resample(GRAINS["Monthly"]).sum()
+    sums["Quarterly"] = sums["Monthly"].resample(GRAINS["Quarterly"]).sum()
+    sums["Yearly"] = sums["Quarterly"].resample(GRAINS["Yearly"]).sum()
+    return sums
+
+
+def revenue_table(sums, revenue_col):
+    """
+    Revenue per period → table with revenue and growth %.
+    """
+    rev_time = sums.reset_index()
 
     # -----------------------------------
     # Growth calculation safety
@@ -97,32 +455,276 @@ def revenue_growth_engine(df, business_kpis):
     # Round growth values
     rev_time["growth_pct"] = rev_time["growth_pct"].round(2)
 
-    # Save results
+    return rev_time
+
+
+@profiled("build_growth_results")
+def build_growth_results(agg, business_kpis):
+    """
+    Converts (merged) partial aggregates into the final
+    growth results: totals, trend, growth and dimensions.
+    """
+
+    results = empty_growth_results()
+
+    date_col = business_kpis["date"]
+    revenue_col = business_kpis["revenue"]
+
+    # -----------------------------------
+    # Calculate TOTAL revenue
+    # -----------------------------------
+    # Add all revenue values and round to 2 decimals
+    results["total_revenue"] = round(agg["revenue_total"], 2)
+
+    # Rows, quantity, profit and what follows from them
+    totals = pd.DataFrame([{revenue_col: agg["revenue_total"], "rows": agg["rows"], **agg["measure_totals"]}])
+    results["measure_totals"] = unit_economics(totals, business_kpis).to_dict(orient="records")[0]
+
+    # -----------------------------------
+    # Decide if we use Weekly or Monthly data
+    # -----------------------------------
+    # Find how many days the data covers
+    if agg["rows"]:
+        span_days = (agg["date_max"] - agg["date_min"]).days
+    else:
+        span_days = 0
+
+    if span_days > 120:
+        # Long time range → Monthly view
+        results["time_grain"] = "Monthly"
+    else:
+        # Short time range → Weekly view
+        results["time_grain"] = "Weekly"
+
+    # -----------------------------------
+    # Revenue over time, at every grain
+    # -----------------------------------
+    daily = agg["daily"].sort_index()
+    daily.name = revenue_col
+    daily.index.name = date_col
+
+    results["revenue_by_grain"] = {
+        grain: revenue_table(sums, revenue_col)
+        for grain, sums in rollup_grains(daily).items()
+    }
+
+    # The default grain is the one shown first
+    rev_time = results["revenue_by_grain"][results["time_grain"]]
     results["revenue_over_time"] = rev_time
     results["growth_over_time"] = rev_time[[date_col, "growth_pct"]]
 
+    # Periods fully covered by the data: a half-finished
+    # last month is left out of the change and anomaly checks
+    complete = complete_periods(
+        rev_time[date_col], GRAINS[results["time_grain"]], agg["date_min"], agg["date_max"]
+    )
+
+    # Latest change between two complete periods
+    ends = np.flatnonzero(complete[1:] & complete[:-1])
+    upto = ends[-1] + 2 if len(ends) else 0
+    if upto:
+        results["change_period"] = rev_time[date_col].iloc[upto - 1]
+
     # -----------------------------------
     # Revenue by each dimension
     # -----------------------------------
-    for dim in dimensions:
-
-        # Group revenue by category
-        dim_rev = (
-            data
-            .groupby(dim)[revenue_col]
-            .sum()
-            .round(2)
-            .sort_values(ascending=False)
-            .reset_index()
-        )
+    for dim, sums in agg["by_dimension"].items():
 
         # Store full data
+        dim_rev = ranked_table(sums, revenue_col)
         results["by_dimension"][dim] = dim_rev
 
         # Store top 3 contributors
         results["top_contributors"][dim] = dim_rev.head(3)
 
+        # Other measures of every member (same member order)
+        table = agg["by_dimension_measures"][dim].reindex(dim_rev[dim], fill_value=0)
+        table.insert(0, revenue_col, dim_rev[revenue_col].to_numpy())
+        results["by_dimension_measures"][dim] = unit_economics(table.reset_index(), business_kpis)
+
+        # Member × period cube (same member order) and what
+        # each member added to the change of the last complete period
+        cube = period_cube(agg["by_dimension_day"][dim], rev_time[date_col])
+        results["dimension_cube"][dim] = cube.reindex(dim_rev[dim], fill_value=0)
+        results["contribution_to_change"][dim] = contribution_to_change(results["dimension_cube"][dim].iloc[:, :upto])
+
+    # Every series checked for anomalies: one per member
+    # of every dimension...
+    series = dict(results["dimension_cube"])
+
+    # Same for pairs of dimensions (only if asked for)
+    for pair, sums in agg["by_dimension_pairs"].items():
+        results["by_dimension_pairs"][pair] = ranked_table(sums, revenue_col)
+
+        # ...and one per combination, e.g. "Store 12 / Technology"
+        cube = period_cube(agg["by_pair_day"][pair], rev_time[date_col])
+        cube.index = pd.Index([" / ".join(map(str, members)) for members in cube.index], name=cube.index.name)
+        series[cube.index.name] = cube
+
     # -----------------------------------
-    # Finally return everything
+    # Anomalies: the total and every series above,
+    # each compared with its own recent past
     # -----------------------------------
+    results["anomalies"] = detect_anomalies(
+        rev_time.set_index(date_col)[revenue_col], series,
+        GRAINS[results["time_grain"]], complete
+    )
+
+    # Dimensions summarised by their top members only:
+    # every sum may be up to this much below the truth
+    results["dimension_error"] = dict(agg.get("dimension_error", {}))
+
     return results
+
+
+def period_cube(cells, periods):
+    """
+    Member × day sums → table with one row per member and
+    one column per period (`periods` = the period end dates,
+    in order, as in revenue_over_time). Every cell goes to
+    its period with one np.bincount over
+    member code × number of periods + period number.
+    """
+    periods = pd.DatetimeIndex(periods)
+    index = cells.index.remove_unused_levels()
+    members = index.levels[0]
+
+    # Period of every day: the first period ending on or after it
+    days = index.levels[1][index.codes[1]]
+    period_codes = periods.searchsorted(days)
+
+    sums = np.bincount(
+        index.codes[0].astype(np.int64) * len(periods) + period_codes,
+        weights=cells.to_numpy(dtype="float64"),
+        minlength=len(members) * len(periods)
+    )
+
+    return pd.DataFrame(
+        sums.reshape(len(members), len(periods)).round(2),
+        index=pd.Index(members, name=index.names[0]),
+        columns=periods
+    )
+
+
+def contribution_to_change(cube, period=None):
+    """
+    How much each member added to (or took away from) the
+    change in revenue between `period` and the period
+    before it (default: the last two periods).
+    One row per member, biggest drop first:
+    previous, current, change, and contribution_pct
+    (the member's share of the total change).
+    """
+    dim = cube.index.name
+    columns = [dim, "previous", "current", "change", "contribution_pct"]
+
+    if cube.shape[1] < 2:
+        return pd.DataFrame(columns=columns)
+
+    position = cube.shape[1] - 1 if period is None else cube.columns.get_loc(pd.Timestamp(period))
+    if position < 1:
+        return pd.DataFrame(columns=columns)
+
+    previous = cube.iloc[:, position - 1].to_numpy()
+    current = cube.iloc[:, position].to_numpy()
+    change = current - previous
+    total_change = change.sum()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = change / total_change * 100 if total_change else np.full(len(change), np.nan)
+
+    table = pd.DataFrame({
+        dim: cube.index,
+        "previous": previous,
+        "current": current,
+        "change": change.round(2),
+        "contribution_pct": share.round(2)
+    })
+    return table.sort_values("change", kind="stable").reset_index(drop=True)
+
+
+def unit_economics(table, business_kpis):
+    """
+    Adds the measures derived from the sums:
+    - margin_pct: profit / revenue × 100
+    - avg_price:  revenue / quantity (price per unit)
+    (only when the profit / quantity column is known).
+    """
+    revenue_col = business_kpis["revenue"]
+    quantity_col = business_kpis.get("quantity")
+    profit_col = business_kpis.get("profit")
+
+    revenue = table[revenue_col].astype("float64")
+    table["rows"] = table["rows"].astype("int64")
+
+    if profit_col in table.columns:
+        profit = table[profit_col].astype("float64")
+        table[profit_col] = profit.round(2)
+        table["margin_pct"] = (profit / revenue * 100).where(revenue != 0).round(2)
+
+    if quantity_col in table.columns:
+        quantity = table[quantity_col].astype("float64")
+        table["avg_price"] = (revenue / quantity).where(quantity != 0).round(2)
+
+    table[revenue_col] = table[revenue_col].round(2)
+    return table
+
+
+def ranked_table(sums, revenue_col):
+    """
+    Member sums → table sorted from the
+    biggest contributor to the smallest.
+    """
+    sums = sums.rename(revenue_col)
+
+    # Members in name order first, so ties keep a stable order
+    try:
+        sums = sums.sort_index()
+    except TypeError:
+        pass
+
+    return (
+        sums
+        .round(2)
+        .sort_values(ascending=False)
+        .reset_index()
+    )
+
+
+@profiled("revenue_growth_engine")
+def revenue_growth_engine(df, business_kpis, pairs=False, top_k=None):
+    """
+    This function helps us understand revenue.
+    It calculates total revenue, growth over time,
+    and shows which categories make the most money.
+    With pairs=True it also adds revenue for every
+    pair of dimensions (e.g. Region × Category).
+    With top_k, huge dimensions only keep (and sort)
+    their top_k biggest members.
+    """
+
+    # -----------------------------------
+    # Getting column names from input
+    # -----------------------------------
+    date_col = business_kpis["date"]        # date column name
+    revenue_col = business_kpis["revenue"]  # revenue column name
+
+    # -----------------------------------
+    # Safety check (very important!)
+    # -----------------------------------
+    if not date_col or not revenue_col:
+        # If we don’t have date or revenue,
+        # we cannot do any analysis
+        results = empty_growth_results()
+        results["warnings"].append("Missing date or revenue column")
+        return results
+
+    # -----------------------------------
+    # The whole frame is just one big block
+    # -----------------------------------
+    agg = prune_revenue_aggregate(aggregate_revenue(df, business_kpis, pairs=pairs), top_k)
+
+    # -----------------------------------
+    # Finally return everything
+    # -----------------------------------
+    return build_growth_results(agg, business_kpis)
@@ -0,0 +1,140 @@
+import warnings
+
+import pandas as pd
+
+from profiling import profiled
+
+# -----------------------------------
+# Date formats we try, in order of preference
+# -----------------------------------
+# When a value fits more than one format
+# (e.g. 03/04/2021) the first one wins,
+# which matches pandas' month-first default
+date_formats = [
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y/%m/%d",
+    "%m/%d/%Y",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%d/%m/%Y",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%m-%d-%Y",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%d-%b-%Y",
+    "%d %b %Y",
+    "%b %d, %Y",
+    "%d %B %Y",
+    "%B %d, %Y",
+    "%m/%d/%y",
+    "%d/%m/%y",
+]
+
+
+def sniff_sample(values, prefix=200):
+    """
+    A small prefix of the distinct text values
+    of a column (what the sniffers look at).
+    """
+    values = pd.Series(values)
+    sample = values.iloc[:prefix * 50].dropna()
+    return sample[sample.map(type) == str].drop_duplicates().head(prefix)
+
+
+def sniff_date_format(values, prefix=200, min_rate=0.9):
+    """
+    Guesses the date format of a column by trying
+    every known format on a few distinct values.
+    Returns the format string, or None if no
+    format fits well enough.
+    """
+    sample = sniff_sample(values, prefix)
+
+    if sample.empty:
+        return None
+
+    best_format, best_rate = None, 0.0
+
+    for fmt in date_formats:
+        parsed = pd.to_datetime(sample, format=fmt, errors="coerce")
+        rate = parsed.notna().mean()
+
+        if rate > best_rate:
+            best_format, best_rate = fmt, rate
+
+        # Can't do better than every value parsing
+        if rate == 1.0:
+            break
+
+    return best_format if best_rate >= min_rate else None
+
+
+def to_datetime(values, fmt=None):
+    """
+    pd.to_datetime with a known format, or
+    pandas' own guessing when we have none.
+    """
+    if fmt:
+        return pd.to_datetime(values, format=fmt, errors="coerce")
+
+    # No format: let pandas guess quietly
+    with warnings.catch_warnings():
+        warnings.filterwarnings(
+            "ignore",
+            message="Could not infer format",
+            category=UserWarning
+        )
+        return pd.to_datetime(values, errors="coerce")
+
+
+def looks_like_dates(values, prefix=200, min_rate=0.5):
+    """
+    Quick check before pandas' slow guessing parse:
+    guesses on the sniff sample only and says whether
+    enough of it came out as dates.
+    Columns with no text values are left to pandas.
+    """
+    sample = sniff_sample(values, prefix)
+
+    if sample.empty:
+        return True
+
+    return to_datetime(sample).notna().mean() >= min_rate
+
+
+@profiled("parse_dates")
+def parse_dates(series, fmt=None, min_rows=1000):
+    """
+    Converts a column into datetimes quickly:
+    - the format is sniffed once (or passed in)
+    - only the distinct strings are parsed and the
+      results are mapped back to every row
+      (order files repeat the same dates a lot, and
+      hashing a string is far cheaper than parsing it)
+    """
+
+    # Already dates (or numbers): nothing to sniff
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return to_datetime(series)
+
+    if fmt is None:
+        sample = sniff_sample(series)
+        fmt = sniff_date_format(sample)
+
+        # No format fits: guessing on every row is slow, so
+        # only do it when the sample looks like dates at all
+        if fmt is None and not looks_like_dates(sample):
+            return pd.Series(pd.NaT, index=series.index, name=series.name, dtype="datetime64[ns]")
+
+    # Parse each distinct value once
+    if len(series) > min_rows:
+        codes, uniques = pd.factorize(series)
+        parsed = pd.DatetimeIndex(to_datetime(uniques, fmt))
+        dates = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+        return pd.Series(dates, index=series.index, name=series.name)
+
+    return to_datetime(series, fmt)
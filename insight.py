@@ -1,12 +1,17 @@
 import pandas as pd
 import numpy as np
 
+from profiling import profiled
+from anomaly import ANOMALY_ALERT_SCORE
+from sketches import topk_pareto
+
 # --------------------------------------------------
 # PHASE 3 – STEP 3
 # This part tries to "read" the data
 # and tell us what is actually happening
 # --------------------------------------------------
 
+@profiled("generate_insights")
 def generate_insights(growth_results, business_kpis):
     """
     This function looks at revenue numbers
@@ -98,99 +103,82 @@ def generate_insights(growth_results, business_kpis):
                 "text": "Revenue rebounded sharply after a low baseline period."
             })
 
+    # Shares of every dimension, computed once for all
+    # of the checks below (one row per dimension)
+    stats = dimension_stats(
+        growth_results["by_dimension"], revenue_col, total_revenue,
+        growth_results.get("dimension_error")
+    )
+
     # --------------------------------------------------
     # 4️⃣ DIMENSION LEADERS
     # --------------------------------------------------
     # Find who is making the most money
-    for dim, table in growth_results["by_dimension"].items():
-
-        if table.empty:
-            continue
-
-        top = table.iloc[0]
-        share = (top[revenue_col] / total_revenue) * 100
-
-        if share >= 35:
-            insights.append({
-                "type": "leader",
-                "severity": 4,
-                "text": f"{top[dim]} is the leading {dim.lower()}, contributing approximately {share:.1f}% of total revenue."
-            })
+    for dim, row in stats[stats["top_share"] >= 35].iterrows():
+        insights.append({
+            "type": "leader",
+            "severity": 4,
+            "text": f"{row['top_member']} is the leading {dim.lower()}, contributing approximately {row['top_share']:.1f}% of total revenue."
+        })
 
     # --------------------------------------------------
     # 5️⃣ TOP-3 CONCENTRATION
     # --------------------------------------------------
     # Too much revenue from just 3 items = risky
-    for dim, table in growth_results["by_dimension"].items():
-
-        if len(table) < 3:
-            continue
-
-        top3_share = table.head(3)[revenue_col].sum() / total_revenue * 100
-
-        if top3_share >= 70:
-            insights.append({
-                "type": "concentration",
-                "severity": 4,
-                "text": f"Revenue is highly concentrated — top 3 {dim.lower()} account for nearly {top3_share:.1f}% of total revenue."
-            })
+    for dim, row in stats[(stats["members"] >= 3) & (stats["top3_share"] >= 70)].iterrows():
+        insights.append({
+            "type": "concentration",
+            "severity": 4,
+            "text": f"Revenue is highly concentrated — top 3 {dim.lower()} account for nearly {row['top3_share']:.1f}% of total revenue."
+        })
 
     # --------------------------------------------------
     # 6️⃣ 60% PARETO CHECK
     # --------------------------------------------------
     # How many items make 60% of revenue
-    for dim, table in growth_results["by_dimension"].items():
-
-        if table.empty:
-            continue
-
-        table = table.copy()
-        table["cum_share"] = table[revenue_col].cumsum() / total_revenue * 100
-
-        top_n = (table["cum_share"] <= 60).sum() + 1
+    for dim, row in stats[stats["members"] > 0].iterrows():
+
+        # Huge dimensions only keep their top members,
+        # so the count is known within a range
+        if row["error"] and row["pareto_n"] > row["members"]:
+            text = f"More than {row['members']} {dim.lower()} are needed to reach 60% of total revenue."
+        elif row["pareto_n_min"] < row["pareto_n"]:
+            text = f"Top {row['pareto_n_min']}–{row['pareto_n']} {dim.lower()} contribute approximately 60% of total revenue."
+        else:
+            text = f"Top {row['pareto_n']} {dim.lower()} contribute approximately 60% of total revenue."
 
         insights.append({
             "type": "pareto",
             "severity": 3,
-            "text": f"Top {top_n} {dim.lower()} contribute approximately 60% of total revenue."
+            "text": text
         })
 
     # --------------------------------------------------
     # 7️⃣ SINGLE DEPENDENCY RISK
     # --------------------------------------------------
     # One thing controlling too much revenue
-    for dim, table in growth_results["by_dimension"].items():
-
-        if table.empty:
-            continue
-
-        top = table.iloc[0]
-        share = top[revenue_col] / total_revenue * 100
-
-        if share >= 30:
-            insights.append({
-                "type": "risk",
-                "severity": 5,
-                "text": f"{top[dim]} alone contributes over {share:.1f}% of revenue, indicating potential concentration risk."
-            })
+    for dim, row in stats[stats["top_share"] >= 30].iterrows():
+        insights.append({
+            "type": "risk",
+            "severity": 5,
+            "text": f"{row['top_member']} alone contributes over {row['top_share']:.1f}% of revenue, indicating potential concentration risk."
+        })
 
     # --------------------------------------------------
     # 8️⃣ MIX BALANCE CHECK
     # --------------------------------------------------
-    for dim, table in growth_results["by_dimension"].items():
-
-        if len(table) < 3:
-            continue
-
-        shares = table[revenue_col] / total_revenue * 100
+    mix = stats[stats["members"] >= 3]
+    balanced = mix["max_share"] - mix["min_share"] < 15
+    skewed = ~balanced & (mix["max_share"] >= 50)
 
-        if shares.max() - shares.min() < 15:
+    for dim in mix.index:
+        if balanced[dim]:
             insights.append({
                 "type": "distribution",
                 "severity": 2,
                 "text": f"Revenue distribution across {dim.lower()} is relatively balanced."
             })
-        elif shares.max() >= 50:
+        elif skewed[dim]:
             insights.append({
                 "type": "risk",
                 "severity": 4,
@@ -198,7 +186,90 @@ def generate_insights(growth_results, business_kpis):
             })
 
     # --------------------------------------------------
-    # 9️⃣ FALLBACK (if nothing found)
+    # 9️⃣ DECLINE DRIVERS
+    # --------------------------------------------------
+    # Last complete period fell: which member explains most of
+    # the drop? (read from the dimension × period cube, no rows
+    # needed; a half-finished last month is not a decline)
+    change_period = growth_results.get("change_period")
+    change = rev_time.loc[rev_time[date_col] == change_period, "growth_pct"]
+    if len(change) and change.iloc[0] < 0:
+        drivers = [
+            (table["contribution_pct"].iloc[0], dim, table[dim].iloc[0])
+            for dim, table in growth_results.get("contribution_to_change", {}).items()
+            if len(table) and table["change"].iloc[0] < 0 and pd.notna(table["contribution_pct"].iloc[0])
+        ]
+
+        if drivers:
+            share, dim, member = max(drivers, key=lambda d: d[0])
+            if share >= 30:
+                insights.append({
+                    "type": "driver",
+                    "severity": 4,
+                    "text": f"{member} ({dim.lower()}) drove {share:.1f}% of the latest revenue decline."
+                })
+
+    # --------------------------------------------------
+    # 🔟 ANOMALIES
+    # --------------------------------------------------
+    # Periods where the total or one member broke sharply
+    # from its own recent past (found by anomaly.py, the
+    # biggest in money first). Only clear breaks: with many
+    # series, a score just past the threshold is often noise
+    anomalies = growth_results.get("anomalies")
+    if anomalies is not None:
+        clear = anomalies[anomalies["score"].abs() >= ANOMALY_ALERT_SCORE]
+        for _, row in clear.head(3).iterrows():
+            where = "total revenue" if pd.isna(row["dimension"]) else f"{row['member']} ({row['dimension'].lower()})"
+            insights.append({
+                "type": "anomaly",
+                "severity": 5 if abs(row["score"]) >= 10 else 4,
+                "text": f"Unusual {row['direction']} in {where} in the period ending {row['period']:%Y-%m-%d}: "
+                        f"{row['revenue']:,.0f} vs about {row['expected']:,.0f} expected."
+            })
+
+    # --------------------------------------------------
+    # 1️⃣1️⃣ MARGINS AND UNIT PRICES
+    # --------------------------------------------------
+    # Quantity and profit were summed in the same pass as
+    # revenue, so these checks cost almost nothing
+    totals = growth_results.get("measure_totals") or {}
+    economics = member_economics(growth_results.get("by_dimension_measures", {}), revenue_col, total_revenue)
+    big = economics[economics["share"] >= 5]
+
+    # Sizeable members far below the overall margin
+    overall_margin = totals.get("margin_pct")
+    if "margin_pct" in big and pd.notna(overall_margin):
+        weak = big[(big["margin_pct"] < 0) | (big["margin_pct"] <= overall_margin - 10)]
+
+        # Biggest profit shortfall first
+        shortfall = (overall_margin - weak["margin_pct"]) * weak[revenue_col]
+        for i in shortfall.sort_values(ascending=False).index[:3]:
+            row = weak.loc[i]
+            insights.append({
+                "type": "margin",
+                "severity": 5 if row["margin_pct"] < 0 else 4,
+                "text": f"{row['member']} ({row['dimension'].lower()}) earns a {row['margin_pct']:.1f}% margin, "
+                        f"against {overall_margin:.1f}% overall."
+            })
+
+    # Sizeable members selling far above / below the usual price per unit
+    overall_price = totals.get("avg_price")
+    if "avg_price" in big and pd.notna(overall_price) and overall_price > 0:
+        ratio = big["avg_price"] / overall_price
+        unusual = np.abs(np.log(ratio)) >= np.log(1.5)
+
+        for i in np.abs(np.log(ratio[unusual])).sort_values(ascending=False).index[:3]:
+            row = big.loc[i]
+            insights.append({
+                "type": "unit_economics",
+                "severity": 2,
+                "text": f"{row['member']} ({row['dimension'].lower()}) sells at {row['avg_price']:,.2f} per unit on average, "
+                        f"{ratio[i]:.1f}× the overall {overall_price:,.2f}."
+            })
+
+    # --------------------------------------------------
+    # FALLBACK (if nothing found)
     # --------------------------------------------------
     if not insights:
         insights.append({
@@ -211,6 +282,109 @@ def generate_insights(growth_results, business_kpis):
     return curate_insights(insights)
 
 
+# --------------------------------------------------
+# DIMENSION STATS
+# All per-dimension numbers the insight rules need,
+# computed in one go over every dimension at once
+# (this matters with hundreds of dimensions).
+# --------------------------------------------------
+
+def dimension_stats(by_dimension, revenue_col, total_revenue, errors=None):
+    """
+    One row per dimension (tables sorted from the biggest
+    member down, as the growth engine returns them):
+    - members:    number of members
+    - top_member: the biggest member
+    - top_share:  % of total revenue from the biggest member
+    - top3_share: % from the 3 biggest members
+    - pareto_n:   members needed to reach about 60% of revenue
+    - max_share / min_share: biggest and smallest member %
+    - error:      how much each member's sum may be too low
+                  (dimensions kept as top members only)
+    - pareto_n_min: fewest members that may reach 60%
+                  (equal to pareto_n when error is 0)
+    """
+    dims = list(by_dimension)
+    tables = [by_dimension[dim] for dim in dims]
+
+    members = np.array([len(table) for table in tables], dtype=int)
+    starts = np.cumsum(members) - members
+
+    # All member values in one array, with the dimension number of each
+    values = np.concatenate(
+        [table[revenue_col].to_numpy(dtype="float64") for table in tables] + [np.zeros(0)]
+    )
+    group = np.repeat(np.arange(len(dims)), members)
+
+    # Running total inside each dimension
+    running = pd.Series(values).groupby(group).cumsum().to_numpy()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = values / total_revenue * 100
+        cum_share = running / total_revenue * 100
+
+    has_rows = members > 0
+    has_top3 = members >= 3
+
+    top_share = np.full(len(dims), np.nan)
+    top_share[has_rows] = shares[starts[has_rows]]
+
+    top3_share = np.full(len(dims), np.nan)
+    top3_share[has_top3] = cum_share[starts[has_top3] + 2]
+
+    # Members needed for 60%: exact, and the fewest possible
+    # when every member may be up to `error` bigger than its sum
+    error = np.array([(errors or {}).get(dim, 0.0) for dim in dims], dtype="float64")
+    pareto_n = np.empty(len(dims), dtype=int)
+    pareto_n_min = np.empty(len(dims), dtype=int)
+    for i, (start, count) in enumerate(zip(starts, members)):
+        pareto_n_min[i], pareto_n[i] = topk_pareto(values[start:start + count], error[i], total_revenue)
+
+    share_series = pd.Series(shares).groupby(group)
+    max_share = share_series.max().reindex(range(len(dims))).to_numpy()
+    min_share = share_series.min().reindex(range(len(dims))).to_numpy()
+
+    # Member labels stay as they are (object column): a member
+    # called 1 must not turn into 1.0 when rows are read back
+    top_member = np.empty(len(dims), dtype=object)
+    top_member[:] = [table[dim].iloc[0] if len(table) else None for dim, table in zip(dims, tables)]
+
+    return pd.DataFrame({
+        "members": members,
+        "top_member": top_member,
+        "top_share": top_share,
+        "top3_share": top3_share,
+        "pareto_n": pareto_n,
+        "pareto_n_min": pareto_n_min,
+        "error": error,
+        "max_share": max_share,
+        "min_share": min_share
+    }, index=pd.Index(dims, dtype=object))
+
+
+def member_economics(by_dimension_measures, revenue_col, total_revenue):
+    """
+    Every member of every dimension in one table:
+    dimension, member, revenue, share (% of total revenue)
+    and margin_pct / avg_price when they are known.
+    """
+    columns = [revenue_col, "margin_pct", "avg_price"]
+    tables = [
+        table[[dim] + [c for c in columns if c in table.columns]]
+        .rename(columns={dim: "member"})
+        .assign(dimension=dim)
+        for dim, table in by_dimension_measures.items()
+    ]
+
+    if not tables:
+        return pd.DataFrame(columns=["member", revenue_col, "dimension", "share"])
+
+    economics = pd.concat(tables, ignore_index=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        economics["share"] = economics[revenue_col].astype("float64") / total_revenue * 100
+    return economics
+
+
 # --------------------------------------------------
 # PHASE 3.5 – INSIGHT CLEANUP
 # --------------------------------------------------
@@ -289,6 +463,16 @@ def generate_next_steps(curated_insights):
             "Analyze top products for margin, discounting, and repeat purchase behavior."
         )
 
+    if "margin" in text_blob:
+        suggestions.append(
+            "Review pricing, discounts and costs in the low-margin segments."
+        )
+
+    if "unusual" in text_blob:
+        suggestions.append(
+            "Check what happened in the flagged periods (promotions, outages, data errors) before reading trends."
+        )
+
     if "volatility" in text_blob:
         suggestions.append(
             "Review seasonality patterns and baseline effects to normalize growth interpretation."
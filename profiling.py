@@ -0,0 +1,229 @@
+import atexit
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+# --------------------------------------------------
+# PROFILING
+# Records how long each phase of a run takes (wall and
+# CPU time), how much memory it needs (tracemalloc peak)
+# and how many rows / columns it worked on.
+#
+# Off by default (then it costs next to nothing).
+# Switch it on with:
+#   AUTOINSIGHT_PROFILE=profile.json python brain.py
+#   python brain.py --profile profile.json
+# and AUTOINSIGHT_PROFILE_FORMAT=chrome (or
+# --profile-format chrome) for a Chrome trace that
+# chrome://tracing or Perfetto can open.
+# --------------------------------------------------
+
+FORMATS = ("json", "chrome")
+
+_state = {
+    "enabled": False,
+    "path": None,
+    "format": "json",
+    "memory": True,
+    "origin": None,
+    "records": [],
+    "stack": [],
+    "registered": False
+}
+
+
+def enable(path, fmt="json", memory=True):
+    """
+    Starts recording. The profile is written to `path`
+    when the program ends (or when write_profile is called).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown profile format: {fmt} (use one of {FORMATS})")
+
+    _state.update({
+        "enabled": True,
+        "path": path,
+        "format": fmt,
+        "memory": memory,
+        "origin": time.perf_counter(),
+        "records": [],
+        "stack": []
+    })
+
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    if not _state["registered"]:
+        atexit.register(write_profile)
+        _state["registered"] = True
+
+
+def is_enabled():
+    return _state["enabled"]
+
+
+def _open(name, rows=None, cols=None, is_step=False):
+    entry = {
+        "name": name,
+        "rows": rows,
+        "cols": cols,
+        "is_step": is_step,
+        "depth": len(_state["stack"]),
+        "start": time.perf_counter(),
+        "cpu": time.process_time(),
+        "peak_seen": 0
+    }
+
+    if _state["memory"]:
+        current, peak = tracemalloc.get_traced_memory()
+
+        # The parent keeps the peak reached so far, then the
+        # counter is reset so this phase gets its own peak
+        if _state["stack"]:
+            parent = _state["stack"][-1]
+            parent["peak_seen"] = max(parent["peak_seen"], peak)
+        tracemalloc.reset_peak()
+        entry["mem_start"] = current
+
+    _state["stack"].append(entry)
+    return entry
+
+
+def _close(entry):
+    # A step still open inside this phase ends with it
+    while _state["stack"] and _state["stack"][-1] is not entry:
+        _close(_state["stack"][-1])
+
+    _state["stack"].pop()
+
+    record = {
+        "name": entry["name"],
+        "depth": entry["depth"],
+        "start_ms": round((entry["start"] - _state["origin"]) * 1000, 3),
+        "seconds": round(time.perf_counter() - entry["start"], 6),
+        "cpu_seconds": round(time.process_time() - entry["cpu"], 6),
+        "rows": entry["rows"],
+        "cols": entry["cols"]
+    }
+
+    if _state["memory"]:
+        peak = max(tracemalloc.get_traced_memory()[1], entry["peak_seen"])
+        record["peak_mb"] = round(max(peak - entry["mem_start"], 0) / 1024 ** 2, 3)
+
+        if _state["stack"]:
+            parent = _state["stack"][-1]
+            parent["peak_seen"] = max(parent["peak_seen"], peak)
+
+    _state["records"].append(record)
+
+
+@contextmanager
+def phase(name, rows=None, cols=None):
+    """
+    Records the code inside the `with` block as one phase.
+    Yields a dictionary where "rows" / "cols" can be
+    filled in once they are known.
+    """
+    if not _state["enabled"]:
+        yield {}
+        return
+
+    entry = _open(name, rows, cols)
+    counts = {}
+    try:
+        yield counts
+    finally:
+        entry["rows"] = counts.get("rows", entry["rows"])
+        entry["cols"] = counts.get("cols", entry["cols"])
+        _close(entry)
+
+
+def step(name):
+    """
+    Starts the next step inside the current phase
+    (the previous step, if any, ends here).
+    """
+    if not _state["enabled"] or not _state["stack"]:
+        return
+
+    if _state["stack"][-1]["is_step"]:
+        _close(_state["stack"][-1])
+
+    _open(name, is_step=True)
+
+
+def _shape(obj):
+    shape = getattr(obj, "shape", None)
+    if not isinstance(shape, tuple) or not shape:
+        return None, None
+    return shape[0], (shape[1] if len(shape) > 1 else None)
+
+
+def profiled(name):
+    """
+    Decorator: records every call of the function as a phase.
+    Rows / columns are taken from the first argument (or the
+    result) when it is a DataFrame or Series.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state["enabled"]:
+                return func(*args, **kwargs)
+
+            rows, cols = _shape(args[0]) if args else (None, None)
+            with phase(name, rows, cols) as counts:
+                result = func(*args, **kwargs)
+                if rows is None:
+                    counts["rows"], counts["cols"] = _shape(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def write_profile(path=None):
+    """
+    Writes the recorded phases as JSON or as a Chrome trace.
+    """
+    if not _state["enabled"] or not _state["records"]:
+        return None
+
+    path = path or _state["path"]
+    records = sorted(_state["records"], key=lambda r: (r["start_ms"], r["depth"]))
+
+    if _state["format"] == "chrome":
+        output = {
+            "displayTimeUnit": "ms",
+            "traceEvents": [
+                {
+                    "name": r["name"],
+                    "cat": "autoinsight",
+                    "ph": "X",
+                    "ts": round(r["start_ms"] * 1000),
+                    "dur": round(r["seconds"] * 1e6),
+                    "pid": os.getpid(),
+                    "tid": 0,
+                    "args": {k: v for k, v in r.items() if k not in ("name", "start_ms", "seconds", "depth")}
+                }
+                for r in records
+            ]
+        }
+    else:
+        output = {"pid": os.getpid(), "memory": _state["memory"], "phases": records}
+
+    with open(path, "w") as f:
+        json.dump(output, f, indent=2)
+
+    return path
+
+
+# Switched on from the environment
+if os.environ.get("AUTOINSIGHT_PROFILE"):
+    enable(
+        os.environ["AUTOINSIGHT_PROFILE"],
+        os.environ.get("AUTOINSIGHT_PROFILE_FORMAT", "json"),
+        memory=os.environ.get("AUTOINSIGHT_PROFILE_MEMORY", "1") != "0"
+    )
@@ -0,0 +1,113 @@
+import time
+
+from Charts import plot_revenue_trend, plot_pareto
+from profiling import profiled
+
+# --------------------------------------------------
+# PDF DASHBOARD EXPORT
+# Every chart of the dashboard is one page. Pages are
+# drawn off-screen (plain matplotlib figures, no screen
+# needed) on one reused figure and written, in order,
+# into one PDF file. The pages stay vector graphics:
+# sharp when zoomed, with text that can be selected.
+#
+# Writing a page (savefig) costs about twice as much as
+# drawing it, and only the process holding the PDF file
+# can write to it, so worker processes don't pay off:
+# on 16 pages they only saved the drawing part and added
+# a matplotlib import per worker.
+# --------------------------------------------------
+
+# Page size (inches) of the dashboard
+PAGE_SIZE = (14, 5)
+
+# The figure every page is drawn on
+_canvas = {}
+
+
+def _page_axes():
+    """
+    Returns the (figure, axis) of the dashboard, cleared
+    for the next page. The figure is created only once.
+    """
+    if "fig" not in _canvas:
+        # A plain Figure (not pyplot): no window, no GUI backend
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=PAGE_SIZE)
+        _canvas["fig"], _canvas["ax"] = fig, fig.subplots()
+
+    fig, ax = _canvas["fig"], _canvas["ax"]
+
+    # Remove extra axes left by the previous page
+    # (e.g. the cumulative % axis of a Pareto chart)
+    for other in fig.axes:
+        if other is not ax:
+            other.remove()
+
+    ax.clear()
+    return fig, ax
+
+
+def dashboard_pages(results, business_kpis, insights=None, grain=None):
+    """
+    The pages of the dashboard, in order:
+    the revenue trend, then one Pareto chart per dimension.
+    The trend is shown at `grain` (default: results["time_grain"]).
+    """
+    grain = grain or results["time_grain"]
+
+    pages = [{
+        "name": "Revenue trend",
+        "kind": "trend",
+        "data": results["revenue_by_grain"][grain],
+        "grain": grain,
+        "date_col": business_kpis["date"],
+        "revenue_col": business_kpis["revenue"],
+        "insights": insights
+    }]
+
+    for dim, table in results["by_dimension"].items():
+        pages.append({
+            "name": f"Pareto: {dim}",
+            "kind": "pareto",
+            "data": table,
+            "dim": dim,
+            "revenue_col": business_kpis["revenue"]
+        })
+
+    return pages
+
+
+def render_page(page):
+    """
+    Draws one page on the shared figure and returns it.
+    """
+    fig, ax = _page_axes()
+
+    if page["kind"] == "trend":
+        plot_revenue_trend(
+            page["data"], page["date_col"], page["revenue_col"], ax,
+            page.get("insights"), grain=page.get("grain")
+        )
+    else:
+        plot_pareto(page["data"], page["dim"], page["revenue_col"], ax, other=True)
+
+    return fig
+
+
+@profiled("render")
+def export_dashboard(pages, out_path):
+    """
+    Draws every page and saves them as one PDF file.
+    Returns [(page name, seconds to draw and save it), ...].
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    timings = []
+    with PdfPages(out_path) as pdf:
+        for page in pages:
+            start = time.perf_counter()
+            pdf.savefig(render_page(page))
+            timings.append((page["name"], time.perf_counter() - start))
+
+    return timings
@@ -0,0 +1,333 @@
+import argparse
+import asyncio
+import json
+import os
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cache import file_fingerprint, load_cached_inference, save_cached_inference
+from batch import read_frame, to_jsonable
+
+# --------------------------------------------------
+# LOCAL ANALYSIS SERVICE
+# A long-running process that answers JSON requests,
+# so dashboards don't pay for starting Python and
+# importing pandas on every request.
+#
+#   python service.py --port 8765 --workers 4
+#   curl -d '{"path": "sales.csv"}' localhost:8765/insights
+#
+# Endpoints (POST, body: {"path": "<CSV / Excel file>"}):
+#   /col_role               column roles
+#   /refine_business_kpis   business KPIs
+#   /revenue_growth_engine  totals, trend, dimensions
+#   /insights               insights, summary, next steps
+#   /analyze                all of the above
+# GET /health               service status
+#
+# Every file is always sent to the same worker process,
+# which keeps recently used datasets (and what was
+# computed on them) in memory. The server itself keeps
+# recently returned answers.
+# --------------------------------------------------
+
+ENDPOINTS = ("col_role", "refine_business_kpis", "revenue_growth_engine", "insights", "analyze")
+
+# Datasets kept in memory by each worker
+DATASET_LRU_SIZE = 8
+
+# Answers kept in memory by the server
+RESULT_LRU_SIZE = 256
+
+# Largest request body accepted (bytes)
+MAX_BODY_BYTES = 1024 ** 2
+
+
+# --------------------------------------------------
+# WORKER SIDE
+# --------------------------------------------------
+
+_datasets = OrderedDict()
+
+
+def _warm_up():
+    """
+    Runs once in every worker: import the heavy
+    libraries before the first request arrives.
+    """
+    import pandas  # noqa: F401
+    import numpy  # noqa: F401
+    import Sort, Refine, category, insight, stream  # noqa: F401,E401
+    return os.getpid()
+
+
+def _dataset(path, fingerprint):
+    """
+    Loaded dataset (and everything computed on it),
+    from the worker's LRU when possible.
+    """
+    from stream import should_stream
+
+    entry = _datasets.get(fingerprint)
+
+    if entry is None:
+        entry = {"path": path, "streaming": should_stream(path)}
+
+        # Huge files are never held in memory: they are streamed
+        if not entry["streaming"]:
+            entry["df"] = read_frame(path)
+
+        _datasets[fingerprint] = entry
+        while len(_datasets) > DATASET_LRU_SIZE:
+            _datasets.popitem(last=False)
+    else:
+        _datasets.move_to_end(fingerprint)
+
+    return entry
+
+
+def run_endpoint(endpoint, path, fingerprint):
+    """
+    Worker task: answers one request. Each step is
+    computed once per dataset and then reused.
+    """
+    from Sort import col_role
+    from Refine import refine_business_kpis
+    from category import revenue_growth_engine
+    from stream import infer_roles_from_file, incremental_growth_engine
+    from insight import generate_insights, generate_executive_summary, generate_next_steps
+
+    entry = _dataset(path, fingerprint)
+
+    if "roles" not in entry:
+        if entry["streaming"]:
+            entry["roles"], entry["business_kpis"], _ = infer_roles_from_file(path)
+        else:
+            cached = load_cached_inference(entry["df"])
+            if cached:
+                entry["roles"], entry["business_kpis"] = cached
+            else:
+                entry["roles"] = col_role(entry["df"])
+                entry["business_kpis"] = refine_business_kpis(entry["df"], entry["roles"])
+                save_cached_inference(entry["df"], entry["roles"], entry["business_kpis"])
+
+    if endpoint == "col_role":
+        return to_jsonable({"roles": entry["roles"]})
+    if endpoint == "refine_business_kpis":
+        return to_jsonable({"business_kpis": entry["business_kpis"]})
+
+    if "results" not in entry:
+        if entry["streaming"]:
+            entry["results"] = incremental_growth_engine(path, entry["business_kpis"])
+        else:
+            entry["results"] = revenue_growth_engine(entry["df"], entry["business_kpis"])
+
+    if endpoint == "revenue_growth_engine":
+        return to_jsonable({"results": entry["results"]})
+
+    if "insights" not in entry:
+        entry["insights"] = generate_insights(entry["results"], entry["business_kpis"])
+
+    answer = {
+        "insights": entry["insights"],
+        "executive_summary": generate_executive_summary(entry["insights"]),
+        "next_steps": generate_next_steps(entry["insights"])
+    }
+
+    if endpoint == "analyze":
+        answer.update({
+            "roles": entry["roles"],
+            "business_kpis": entry["business_kpis"],
+            "results": entry["results"]
+        })
+
+    return to_jsonable(answer)
+
+
+# --------------------------------------------------
+# SERVER SIDE
+# --------------------------------------------------
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def make_worker():
+    """
+    One warm worker: a pool with a single process.
+    """
+    return ProcessPoolExecutor(max_workers=1, initializer=_warm_up)
+
+
+def make_workers(count):
+    """
+    One single-process pool per worker, so a file can
+    always be sent to the same (warm) worker.
+    """
+    workers = [make_worker() for _ in range(count)]
+
+    # Start every worker process now, not on the first request
+    for worker in workers:
+        worker.submit(_warm_up).result()
+
+    return workers
+
+
+def make_handler(workers):
+    results = OrderedDict()
+    loop_state = {"requests": 0}
+
+    async def answer(method, target, body):
+        """
+        Returns (HTTP status, JSON payload) for one request.
+        """
+        endpoint = target.split("?", 1)[0].strip("/")
+
+        if endpoint == "health":
+            return 200, {
+                "status": "ok",
+                "workers": len(workers),
+                "cached_answers": len(results),
+                "requests": loop_state["requests"]
+            }
+
+        if endpoint not in ENDPOINTS:
+            return 404, {"error": f"Unknown endpoint: /{endpoint}"}
+        if method != "POST":
+            return 405, {"error": "Use POST with a JSON body"}
+
+        try:
+            path = json.loads(body or b"{}")["path"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": 'Body must be JSON like {"path": "data.csv"}'}
+
+        if not isinstance(path, str) or not os.path.isfile(path):
+            return 400, {"error": f"File not found: {path}"}
+
+        # Same file version + endpoint → answer from memory
+        fingerprint = file_fingerprint(path)
+        key = (endpoint, fingerprint)
+
+        if key in results:
+            results.move_to_end(key)
+            return 200, results[key]
+
+        slot = zlib.crc32(fingerprint.encode()) % len(workers)
+        worker = workers[slot]
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(worker, run_endpoint, endpoint, path, fingerprint)
+        except BrokenProcessPool as e:
+            # The worker died (e.g. out of memory): only this request
+            # fails, the slot gets a new worker for the next ones
+            if workers[slot] is worker:
+                workers[slot] = make_worker()
+                worker.shutdown(wait=False, cancel_futures=True)
+            return 500, {"error": f"Worker process died, restarted it: {e}"}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+        results[key] = response
+        while len(results) > RESULT_LRU_SIZE:
+            results.popitem(last=False)
+
+        return 200, response
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                loop_state["requests"] += 1
+
+                if length < 0:
+                    status, payload = 400, {"error": "Invalid Content-Length header"}
+                    version = "HTTP/1.0"   # the body can't be skipped: close the connection
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "Request body too large"}
+                    version = "HTTP/1.0"   # close the connection, the body is not read
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await answer(method.upper(), target, body)
+
+                data = json.dumps(payload).encode()
+                keep_alive = (
+                    version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                )
+
+                writer.write(
+                    f"{version} {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def serve(host="127.0.0.1", port=8765, socket_path=None, workers=2):
+    """
+    Starts the warm workers and serves requests forever.
+    """
+    pool = make_workers(workers)
+    handler = make_handler(pool)
+
+    if socket_path:
+        server = await asyncio.start_unix_server(handler, path=socket_path)
+        where = socket_path
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        where = f"http://{host}:{port}"
+
+    print(f"🚀 Analysis service listening on {where} ({workers} warm workers)")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for worker in pool:
+            worker.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local JSON service for the analytics pipeline.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", default=None, help="serve on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=2, help="warm worker processes")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket, args.workers))
+    except KeyboardInterrupt:
+        print("\n👋 Service stopped")
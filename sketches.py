@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------
+# SKETCHES
+# Small summaries of huge columns that answer a
+# question approximately, with a known error, using
+# a fixed (small) amount of memory.
+# --------------------------------------------------
+
+# --------------------------------------------------
+# Distinct ratio of a huge column
+# --------------------------------------------------
+
+# Rows counted exactly before deciding from a sample
+EXACT_ROWS = 100_000
+
+
+def distinct_ratio_below(values, threshold, exact_rows=EXACT_ROWS, seed=42):
+    """
+    True if (distinct values / rows) < threshold, without
+    counting every distinct value of a huge column when
+    a sample already settles it: the distinct ratio only
+    goes down as rows are added, so if a random sample of
+    `exact_rows` rows is far below the threshold, so is the
+    whole column (the usual case for real dimensions).
+    Otherwise the whole column is counted exactly.
+    """
+    values = pd.Series(values)
+    n_rows = max(1, len(values))
+
+    if len(values) > exact_rows:
+        positions = np.random.default_rng(seed).integers(0, len(values), exact_rows)
+        if values.iloc[positions].nunique(dropna=True) / exact_rows < threshold / 2:
+            return True
+
+    return values.nunique(dropna=True) / n_rows < threshold
+
+
+# --------------------------------------------------
+# Heavy hitters: the biggest members of a dimension
+# with millions of members, in fixed memory.
+# Exact sums of every chunk are merged in, and only the
+# `capacity` biggest members are kept (Misra-Gries /
+# Space-Saving style). Each time members are dropped,
+# the largest dropped sum is added to an error "floor":
+#   kept member:    sum <= true total <= sum + floor
+#   dropped member: true total <= floor
+# Merging two summaries adds their floors.
+# (Bounds assume member sums are not negative.)
+# --------------------------------------------------
+
+TOPK_CAPACITY = 10_000
+
+
+def topk_prune(sums, floor=0.0, capacity=TOPK_CAPACITY):
+    """
+    Keeps the `capacity` biggest members of `sums`.
+    Returns (kept sums, new floor).
+    """
+    if capacity is None or len(sums) <= capacity:
+        return sums, floor
+
+    values = sums.to_numpy(dtype="float64")
+    order = np.argpartition(-values, capacity)
+
+    # The biggest dropped sum bounds what any dropped member lost
+    cutoff = max(float(values[order[capacity]]), 0.0)
+
+    return sums.iloc[np.sort(order[:capacity])], floor + cutoff
+
+
+def topk_merge(left, left_floor, right, right_floor, capacity=TOPK_CAPACITY):
+    """
+    Merges two heavy-hitter summaries (sums + floor).
+    """
+    return topk_prune(left.add(right, fill_value=0), left_floor + right_floor, capacity)
+
+
+def topk_pareto(sorted_sums, floor, total, share=60):
+    """
+    How many members reach `share`% of the total, as
+    (fewest possible, most possible) given the floor.
+    `sorted_sums` goes from the biggest member down.
+    With floor 0 both numbers are the exact answer.
+    """
+    values = np.asarray(sorted_sums, dtype="float64")
+    reached = np.cumsum(values)
+
+    # Every member may be up to `floor` bigger than its sum
+    best_case = reached + floor * np.arange(1, len(values) + 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        most = int((reached / total * 100 <= share).sum()) + 1
+        fewest = int((best_case / total * 100 <= share).sum()) + 1
+
+    return min(fewest, most), most
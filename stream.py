@@ -0,0 +1,615 @@
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from Sort import col_role
+from Refine import refine_business_kpis
+from cache import (
+    CACHE_DIR,
+    CACHE_ENABLED,
+    load_cached_inference,
+    save_cached_inference,
+    open_cached_pieces,
+    save_cached_pieces
+)
+from dates import parse_dates
+from profiling import profiled
+from category import (
+    aggregate_revenue,
+    merge_revenue_aggregates,
+    build_growth_results,
+    empty_growth_results,
+    prune_revenue_aggregate,
+    measure_columns,
+    to_amounts
+)
+from sketches import TOPK_CAPACITY
+
+# --------------------------------------------------
+# STREAMING MODE
+# Very large CSV files do not fit in memory.
+# Instead of loading everything, we read the file
+# in chunks and only keep small partial sums.
+# Big Excel workbooks are read the same way: rows are
+# streamed in read-only mode, and the sheet is stored
+# in the cache (Feather) the first time, so later runs
+# don't parse the XML again.
+# --------------------------------------------------
+
+# Files bigger than this are processed chunk by chunk
+STREAM_THRESHOLD_BYTES = 1024 ** 3   # 1 GB
+
+# Excel is compressed and much slower to parse than CSV:
+# workbooks bigger than this are streamed too
+EXCEL_STREAM_THRESHOLD_BYTES = 20 * 1024 ** 2   # 20 MB
+
+# Rows of an Excel sheet turned into a DataFrame at once
+EXCEL_BATCH_ROWS = 50_000
+
+# Files bigger than this get their column roles from a
+# random sample first, then only the needed columns are loaded
+SAMPLE_FIRST_THRESHOLD_BYTES = 100 * 1024 ** 2   # 100 MB
+
+# Number of rows read at once in streaming mode
+DEFAULT_CHUNKSIZE = 500_000
+
+# Rows in the sample used to detect column roles
+DEFAULT_SAMPLE_LIMIT = 5000
+
+# Rows read to check the schema against cached column roles
+HEAD_ROWS = 1000
+
+# Changes whenever the saved aggregate state changes shape
+# (older states are then aggregated again from scratch)
+STATE_VERSION = 5
+
+
+def is_workbook(path):
+    """
+    True for Excel files that can be read row by row.
+    """
+    return path.lower().endswith((".xlsx", ".xlsm"))
+
+
+def should_stream(path, threshold=STREAM_THRESHOLD_BYTES, excel_threshold=EXCEL_STREAM_THRESHOLD_BYTES):
+    """
+    Decides if a file is too big to load in one go.
+    CSV and Excel (.xlsx / .xlsm) files can be streamed.
+    """
+    if not os.path.isfile(path):
+        return False
+
+    if is_workbook(path):
+        return os.path.getsize(path) > excel_threshold
+
+    return path.lower().endswith(".csv") and os.path.getsize(path) > threshold
+
+
+def should_sample_first(path, threshold=SAMPLE_FIRST_THRESHOLD_BYTES):
+    """
+    Decides if column roles should be detected on a
+    sample before the (column-restricted) full load.
+    """
+    if not path.lower().endswith(".csv") or not os.path.isfile(path):
+        return False
+
+    return os.path.getsize(path) > threshold
+
+
+def _worksheet(workbook, sheet=None):
+    """
+    The sheet to read: the first one (None), a position
+    (0 = first) or a name.
+    """
+    if sheet is None:
+        return workbook.worksheets[0]
+
+    if isinstance(sheet, str) and sheet in workbook.sheetnames:
+        return workbook[sheet]
+
+    if str(sheet).isdigit() and int(sheet) < len(workbook.worksheets):
+        return workbook.worksheets[int(sheet)]
+
+    raise ValueError(f"Sheet {sheet!r} not found. Sheets: {', '.join(workbook.sheetnames)}")
+
+
+def sheet_name(path, sheet=None):
+    """
+    Name of the chosen sheet of a workbook (None → first).
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return _worksheet(workbook, sheet).title
+    finally:
+        workbook.close()
+
+
+def iter_excel_chunks(path, chunksize=EXCEL_BATCH_ROWS, usecols=None, sheet=None):
+    """
+    Reads an Excel sheet row by row (read-only mode)
+    and yields DataFrames of at most `chunksize` rows.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+
+    try:
+        rows = _worksheet(workbook, sheet).iter_rows(values_only=True)
+        header = list(next(rows, ()))
+
+        keep = [i for i, name in enumerate(header) if usecols is None or name in usecols]
+        columns = [header[i] for i in keep]
+
+        batch = []
+        start = 0
+        for row in rows:
+            batch.append([row[i] if i < len(row) else None for i in keep])
+
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch)))
+                start += len(batch)
+                batch = []
+
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch)))
+
+    finally:
+        workbook.close()
+
+
+def iter_workbook_chunks(path, chunksize=DEFAULT_CHUNKSIZE, usecols=None, sheet=None):
+    """
+    Yields an Excel sheet as DataFrames of about
+    `chunksize` rows. The first time a workbook is
+    seen, the whole sheet is streamed into the cache
+    (one batch in memory at a time); then it is read
+    from there. Without the cache (switched off, no
+    pyarrow, or a sheet that could not be stored) the
+    sheet is streamed straight from the workbook.
+    """
+    pieces = open_cached_pieces(path, usecols, sheet, chunksize)
+
+    if pieces is None and save_cached_pieces(path, iter_excel_chunks(path, sheet=sheet), sheet=sheet):
+        pieces = open_cached_pieces(path, usecols, sheet, chunksize)
+
+    if pieces is None:
+        pieces = iter_excel_chunks(path, min(chunksize, EXCEL_BATCH_ROWS), usecols, sheet)
+
+    yield from pieces
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE, usecols=None, sheet=None):
+    """
+    Yields the file as a sequence of DataFrames,
+    each one with at most `chunksize` rows.
+    `sheet` picks the sheet of an Excel file.
+    """
+    if is_workbook(path):
+        yield from iter_workbook_chunks(path, chunksize=chunksize, usecols=usecols, sheet=sheet)
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=usecols)
+
+
+def read_head(path, nrows=HEAD_ROWS, sheet=None):
+    """
+    Reads only the first rows of a file.
+    """
+    if is_workbook(path):
+        return next(iter_excel_chunks(path, nrows, sheet=sheet), pd.DataFrame())
+    if path.lower().endswith(".xls"):
+        return pd.read_excel(path, nrows=nrows, sheet_name=0 if sheet is None else sheet)
+    return pd.read_csv(path, nrows=nrows)
+
+
+@profiled("reservoir_sample")
+def reservoir_sample(path, sample_limit=DEFAULT_SAMPLE_LIMIT, chunksize=DEFAULT_CHUNKSIZE, seed=42, sheet=None):
+    """
+    Picks `sample_limit` random rows from a file
+    without loading the whole file.
+
+    Every row gets a random number and we keep the rows
+    with the smallest numbers seen so far (a reservoir),
+    so memory never goes above one chunk + the sample.
+    """
+    rng = np.random.default_rng(seed)
+
+    sample = None
+    keys = None
+
+    for chunk in iter_chunks(path, chunksize=chunksize, sheet=sheet):
+        chunk_keys = rng.random(len(chunk))
+
+        # Once the reservoir is full, only rows that beat
+        # the current worst key can get in
+        if sample is not None and len(sample) >= sample_limit:
+            better = chunk_keys < keys.max()
+            chunk, chunk_keys = chunk[better], chunk_keys[better]
+
+        if sample is None:
+            sample, keys = chunk, chunk_keys
+        elif len(chunk):
+            sample = pd.concat([sample, chunk])
+            keys = np.concatenate([keys, chunk_keys])
+
+        if len(sample) > sample_limit:
+            best = np.argpartition(keys, sample_limit)[:sample_limit]
+            sample, keys = sample.iloc[best], keys[best]
+
+    if sample is None:
+        return pd.DataFrame()
+
+    # Keep the rows in file order (dates stay in order)
+    return sample.sort_index().reset_index(drop=True)
+
+
+@profiled("infer_roles_from_file")
+def infer_roles_from_file(path, sample_limit=DEFAULT_SAMPLE_LIMIT, chunksize=DEFAULT_CHUNKSIZE, sheet=None):
+    """
+    Settles column roles and business KPIs from a
+    random sample of the file, before any full load.
+    If the same schema was analysed before (and the
+    first rows still agree), the cached decisions are
+    used and the file is not sampled at all.
+    Returns (roles, business_kpis, sample); sample is
+    None when the cached decisions were used.
+    """
+    head = read_head(path, sheet=sheet)
+
+    cached = load_cached_inference(head)
+    if cached:
+        roles, business_kpis = cached
+        return roles, business_kpis, None
+
+    sample = reservoir_sample(path, sample_limit=sample_limit, chunksize=chunksize, sheet=sheet)
+
+    roles = col_role(sample, sample_limit=sample_limit)
+    business_kpis = refine_business_kpis(sample, roles)
+
+    save_cached_inference(head, roles, business_kpis)
+
+    return roles, business_kpis, sample
+
+
+def needed_columns(business_kpis):
+    """
+    The only columns the growth engine reads.
+    """
+    columns = [business_kpis["date"], business_kpis["revenue"]] + measure_columns(business_kpis) \
+        + business_kpis["dimensions"]
+    return list(dict.fromkeys(c for c in columns if c))
+
+
+def compact_dtypes(business_kpis):
+    """
+    dtypes to read the needed columns with: dimensions
+    become categories (each distinct name stored once).
+    """
+    return {dim: "category" for dim in business_kpis["dimensions"]}
+
+
+def downcast_exact(values):
+    """
+    float64 → float32 and int64 → int32, but only when
+    every value stays exactly the same.
+    """
+    if values.dtype.kind == "f" and values.dtype.itemsize > 4:
+        small = values.astype("float32")
+        if ((small.astype("float64") == values) | values.isna()).all():
+            return small
+
+    elif values.dtype.kind == "i" and values.dtype.itemsize > 4 and len(values):
+        limits = np.iinfo("int32")
+        if limits.min <= values.min() and values.max() <= limits.max:
+            return values.astype("int32")
+
+    return values
+
+
+def compact_frame(df, business_kpis):
+    """
+    Shrinks the needed columns once they are loaded:
+    - the date column becomes real datetimes
+    - revenue (and quantity / profit) become numbers,
+      float32 / int32 when safe
+    - dimensions become categories
+    (sums are still done in 64 bits by the growth engine)
+    """
+    date_col = business_kpis["date"]
+    revenue_col = business_kpis["revenue"]
+
+    if date_col in df.columns:
+        df[date_col] = parse_dates(df[date_col], business_kpis.get("date_format"))
+
+    for col in [revenue_col] + measure_columns(business_kpis):
+        if col in df.columns:
+            df[col] = downcast_exact(to_amounts(df[col]))
+
+    for dim in business_kpis["dimensions"]:
+        if dim in df.columns and not isinstance(df[dim].dtype, pd.CategoricalDtype):
+            df[dim] = df[dim].astype("category")
+
+    return df
+
+
+def aggregate_chunks(chunks, business_kpis, pairs=False, top_k=TOPK_CAPACITY):
+    """
+    Aggregates every chunk and merges the partial sums.
+    Dimensions keep at most `top_k` members (None = all),
+    so memory does not grow with their cardinality.
+    Returns None if there were no chunks.
+    """
+    agg = None
+    for chunk in chunks:
+        part = aggregate_revenue(chunk, business_kpis, pairs=pairs)
+        if agg is None:
+            agg = prune_revenue_aggregate(part, top_k)
+        else:
+            agg = merge_revenue_aggregates(agg, part, top_k=top_k)
+    return agg
+
+
+@profiled("streaming_growth_engine")
+def streaming_growth_engine(path, business_kpis, chunksize=DEFAULT_CHUNKSIZE, pairs=False, top_k=TOPK_CAPACITY,
+                            sheet=None):
+    """
+    Same output as revenue_growth_engine, but the file
+    is read chunk by chunk and never fully loaded.
+    Dimensions with more than `top_k` members are
+    summarised by their biggest members (see sketches.py).
+    """
+
+    date_col = business_kpis["date"]
+    revenue_col = business_kpis["revenue"]
+
+    if not date_col or not revenue_col:
+        results = empty_growth_results()
+        results["warnings"].append("Missing date or revenue column")
+        return results
+
+    # Only read the columns we actually aggregate
+    usecols = needed_columns(business_kpis)
+
+    agg = aggregate_chunks(
+        iter_chunks(path, chunksize=chunksize, usecols=usecols, sheet=sheet),
+        business_kpis, pairs=pairs, top_k=top_k
+    )
+
+    if agg is None:
+        # Empty file: aggregate an empty frame so the output shape is the same
+        agg = aggregate_revenue(pd.DataFrame(columns=usecols), business_kpis, pairs=pairs)
+
+    return build_growth_results(agg, business_kpis)
+
+
+# --------------------------------------------------
+# INCREMENTAL (APPEND) MODE
+# Daily exports only grow by a few rows. We save the
+# partial sums of the last run and, next time, only
+# aggregate the rows that were added since.
+# --------------------------------------------------
+
+def state_path_for(path, sheet=None):
+    """
+    Where the saved aggregate state of a file
+    (or of one sheet of a workbook) lives.
+    """
+    key = os.path.abspath(path) if sheet is None else f"{os.path.abspath(path)}#{sheet}"
+    name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    # Own folder: evicting dataset entries never touches them
+    return os.path.join(CACHE_DIR, "state", name + ".pkl")
+
+
+def _tail_hash(path, offset, size=64 * 1024):
+    """
+    Hash of the bytes just before `offset`
+    (used to check the old part of the file is untouched).
+    """
+    with open(path, "rb") as f:
+        f.seek(max(0, offset - size))
+        return hashlib.blake2b(f.read(offset - max(0, offset - size)), digest_size=16).hexdigest()
+
+
+def _ends_with_newline(path):
+    """
+    True if the file's last byte is a line break.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _state_signature(business_kpis, pairs, top_k):
+    """
+    Saved sums are only reusable for the same KPIs.
+    """
+    return (
+        STATE_VERSION,
+        business_kpis["date"],
+        business_kpis.get("date_format"),
+        business_kpis["revenue"],
+        tuple(measure_columns(business_kpis)),
+        tuple(business_kpis["dimensions"]),
+        pairs,
+        top_k
+    )
+
+
+def load_growth_state(state_path):
+    """
+    Reads a saved aggregate state (None if there is none).
+    """
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def save_growth_state(state_path, state):
+    """
+    Writes the aggregate state (atomically).
+    """
+    os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+    with open(state_path + ".tmp", "wb") as f:
+        pickle.dump(state, f)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def _rows_after_offset(path, offset, usecols, chunksize):
+    """
+    CSV rows written after byte `offset`
+    (the header is taken from the top of the file).
+    """
+    header = list(pd.read_csv(path, nrows=0).columns)
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        yield from pd.read_csv(f, header=None, names=header, usecols=usecols, chunksize=chunksize)
+
+
+def _merge(left, right, top_k):
+    """
+    merge_revenue_aggregates, where either side may be None.
+    """
+    if left is None:
+        return right if right is None else prune_revenue_aggregate(right, top_k)
+    if right is None:
+        return left
+    return merge_revenue_aggregates(left, right, top_k=top_k)
+
+
+def _aggregate_from_day(path, business_kpis, first_day, usecols, chunksize, pairs, top_k, sheet=None):
+    """
+    Aggregates the rows dated on or after `first_day`
+    (every row when None), in two parts: the rows of the
+    last day seen, and all the rows before that day.
+    The last day is kept apart because rows for it can
+    still be added later: the next run reads it again.
+    Returns (before, last, last_day).
+    """
+    before = last = None
+    last_day = None
+
+    for chunk in iter_chunks(path, chunksize=chunksize, usecols=usecols, sheet=sheet):
+        days = parse_dates(chunk[business_kpis["date"]], business_kpis.get("date_format")).dt.normalize()
+        if first_day is not None:
+            chunk, days = chunk[days >= first_day], days[days >= first_day]
+
+        newest = days.max()
+        if pd.isna(newest):
+            continue
+
+        # A later day: the old last day is complete now
+        if last_day is None or newest > last_day:
+            before = _merge(before, last, top_k)
+            last, last_day = None, newest
+
+        on_last_day = (days == last_day).to_numpy()
+        if not on_last_day.all():
+            before = _merge(before, aggregate_revenue(chunk[~on_last_day], business_kpis, pairs=pairs), top_k)
+        if on_last_day.any():
+            last = _merge(last, aggregate_revenue(chunk[on_last_day], business_kpis, pairs=pairs), top_k)
+
+    return before, last, last_day
+
+
+@profiled("incremental_growth_engine")
+def incremental_growth_engine(path, business_kpis, state_path=None, chunksize=DEFAULT_CHUNKSIZE, pairs=False,
+                              top_k=TOPK_CAPACITY, sheet=None):
+    """
+    Same output as streaming_growth_engine, but the
+    partial sums are saved on disk and a later run only
+    folds in the new rows:
+    - CSV files that were appended to: rows after the
+      byte offset where the last run stopped. A CSV file
+      that was rewritten or cut is aggregated again from
+      scratch.
+    - Excel workbooks (no byte offset to resume from):
+      rows dated on or after the last day seen. That day
+      is aggregated again, so rows added later for it are
+      counted too.
+    If the KPIs changed, everything is aggregated again.
+    Huge dimensions keep their `top_k` biggest members.
+    """
+
+    date_col = business_kpis["date"]
+    revenue_col = business_kpis["revenue"]
+
+    if not date_col or not revenue_col:
+        results = empty_growth_results()
+        results["warnings"].append("Missing date or revenue column")
+        return results
+
+    state_path = state_path or state_path_for(path, sheet)
+    usecols = needed_columns(business_kpis)
+    signature = _state_signature(business_kpis, pairs, top_k)
+    size = os.path.getsize(path)
+    is_csv = path.lower().endswith(".csv")
+
+    saved = load_growth_state(state_path)
+    if saved is not None and saved["signature"] != signature:
+        saved = None
+
+    if is_csv:
+        appended = (
+            saved is not None
+            and saved["tail_hash"] is not None
+            and size >= saved["offset"]
+            and _tail_hash(path, saved["offset"]) == saved["tail_hash"]
+        )
+
+        if appended:
+            # Appended CSV: only parse the new bytes
+            new = None
+            if size > saved["offset"]:
+                new = aggregate_chunks(
+                    _rows_after_offset(path, saved["offset"], usecols, chunksize),
+                    business_kpis, pairs=pairs, top_k=top_k
+                )
+            agg = _merge(saved["agg"], new, top_k)
+        else:
+            # First run, or the file was rewritten: aggregate the whole file
+            agg = aggregate_chunks(
+                iter_chunks(path, chunksize=chunksize, usecols=usecols, sheet=sheet),
+                business_kpis, pairs=pairs, top_k=top_k
+            )
+
+        state = {
+            "signature": signature,
+            "offset": size,
+            # The byte offset is only safe to resume from at the end of a line
+            "tail_hash": _tail_hash(path, size) if _ends_with_newline(path) else None,
+            "agg": agg
+        }
+
+    else:
+        # Only the rows from the last day seen on (everything the first time)
+        first_day = None if saved is None else saved["last_day"]
+        before, last, last_day = _aggregate_from_day(
+            path, business_kpis, first_day, usecols, chunksize, pairs, top_k, sheet
+        )
+
+        if saved is not None:
+            before = _merge(saved["before"], before, top_k)
+            last_day = first_day if last_day is None else last_day
+
+        agg = _merge(before, last, top_k)
+        state = {"signature": signature, "before": before, "last_day": last_day}
+
+    if agg is None:
+        agg = aggregate_revenue(pd.DataFrame(columns=usecols), business_kpis, pairs=pairs)
+
+    if CACHE_ENABLED or state_path != state_path_for(path, sheet):
+        save_growth_state(state_path, state)
+
+    return build_growth_results(agg, business_kpis)